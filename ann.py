@@ -0,0 +1,179 @@
+import numpy as np
+
+
+def pair_scores(matrix, left, right):
+    """Dot products of row pairs (left[i], right[i]) of a sparse matrix"""
+    if len(left) == 0:
+        return np.zeros(0, dtype=np.float32)
+    products = matrix[left].multiply(matrix[right])
+    return np.asarray(products.sum(axis=1), dtype=np.float32).ravel()
+
+
+def random_neighbors(rng, n, k):
+    """
+    n x k random row ids, each row listing k distinct rows other than
+    itself. Repeated draws are redrawn until none are left; when k is a
+    large share of n, a random permutation per row is cheaper.
+    """
+    if 2 * k >= n:
+        keys = rng.random((n, n))
+        keys[np.arange(n), np.arange(n)] = np.inf
+        return np.argsort(keys, axis=1)[:, :k]
+
+    rows = np.arange(n)[:, None]
+    indices = rng.integers(0, n - 1, size=(n, k))
+    indices += indices >= rows
+    while True:
+        order = np.argsort(indices, axis=1, kind="stable")
+        ordered = np.take_along_axis(indices, order, axis=1)
+        repeated = np.zeros((n, k), dtype=bool)
+        repeated[:, 1:] = ordered[:, 1:] == ordered[:, :-1]
+        if not repeated.any():
+            return indices
+        row, column = np.nonzero(repeated)
+        redrawn = rng.integers(0, n - 1, size=len(row))
+        indices[row, order[row, column]] = redrawn + (redrawn >= row)
+
+
+class NeighborGraph:
+    """
+    Approximate k-nearest-neighbour graph of L2 normalised sparse rows.
+
+    Built by NN-descent: starting from random neighbour lists, every row
+    repeatedly scores the neighbours of its neighbours (and is offered to
+    them in turn) and keeps the k best, until hardly any list changes.
+    Only pairs involving a neighbour that arrived in the last round are
+    scored again. The work grows with N x sample^2 per round instead of
+    N^2, and the scores kept are exact cosines, only recall is approximate.
+
+    The recommender only stores the neighbour lists built by fit().
+    query() exists for benchmarks/bench_ann.py, which measures searching
+    the graph for vectors outside it; nothing in the app calls it.
+    """
+
+    def __init__(self, k, sample=12, max_iterations=12, tolerance=0.001, seed=0):
+        self.k = k
+        self.sample = sample
+        self.max_iterations = max_iterations
+        # stop once fewer than this share of the list entries change in a round
+        self.tolerance = tolerance
+        self.seed = seed
+        self.matrix = None
+        self.indices = None
+        self.scores = None
+
+    def fit(self, matrix):
+        self.matrix = matrix.tocsr()
+        n = self.matrix.shape[0]
+        k = self.k = max(0, min(self.k, n - 1))
+        rng = np.random.default_rng(self.seed)
+        rows = np.repeat(np.arange(n), k)
+
+        indices = random_neighbors(rng, n, k)
+        scores = pair_scores(self.matrix, rows, indices.ravel()).reshape(n, k)
+        fresh = np.ones((n, k), dtype=bool)
+
+        for _ in range(self.max_iterations):
+            sample = min(self.sample, k)
+            sampled = indices[:, :sample]
+            sampled_fresh = fresh[:, :sample]
+            # row i meets j = sampled[sampled[i, a], b], worth scoring if
+            # either hop is a neighbour that arrived in the last round
+            hops = sampled[sampled]
+            worth = sampled_fresh[:, :, None] | sampled_fresh[sampled]
+            left = np.broadcast_to(np.arange(n)[:, None, None], hops.shape)[worth]
+            right = hops[worth]
+            fresh[:, :sample] = False
+            keep = left != right
+            left, right = left[keep], right[keep]
+
+            indices, scores, fresh, changed = self._merge(
+                indices,
+                scores,
+                fresh,
+                np.concatenate([left, right]),
+                np.concatenate([right, left]),
+            )
+            if changed < self.tolerance * n * k:
+                break
+
+        self.indices = indices.astype(np.int32)
+        self.scores = scores.astype(np.float32)
+        return self
+
+    def _merge(self, indices, scores, fresh, left, right):
+        """Keep the k best of each row's list and its new candidates"""
+        n, k = indices.shape
+        current = np.arange(n, dtype=np.int64).repeat(k) * n + indices.ravel()
+        keys = np.concatenate([current, left.astype(np.int64) * n + right])
+        # a pair already listed keeps its score and freshness
+        keys, first = np.unique(keys, return_index=True)
+        known = first < len(current)
+        pair_rows, pair_cols = keys // n, keys % n
+
+        pair_scores_ = np.empty(len(keys), dtype=np.float32)
+        pair_scores_[known] = scores.ravel()[first[known]]
+        pair_scores_[~known] = pair_scores(self.matrix, pair_rows[~known], pair_cols[~known])
+        pair_fresh = np.ones(len(keys), dtype=bool)
+        pair_fresh[known] = fresh.ravel()[first[known]]
+
+        # ties go to the lower row id, as in the exact index
+        order = np.lexsort((pair_cols, -pair_scores_, pair_rows))
+        starts = np.searchsorted(pair_rows[order], np.arange(n))
+        ends = np.append(starts[1:], len(order))
+        # every row keeps at least its own k distinct neighbours, so this
+        # never pads; if it did, a row repeats its last candidate rather
+        # than reading into the next row's block
+        top = order[np.minimum(starts[:, None] + np.arange(k), ends[:, None] - 1)]
+        changed = int(np.count_nonzero(~known[top]))
+        return pair_cols[top], pair_scores_[top], pair_fresh[top], changed
+
+    def query(self, vector, k, beam=32, entry_points=16, exclude=None):
+        """
+        Approximate top-k rows for one sparse row vector by a greedy
+        best-first walk of the graph.
+
+        Args:
+            vector (scipy.sparse matrix): 1 x V L2 normalised row
+            k (int): Number of rows to return
+            beam (int): Best rows kept while walking; larger is slower and
+                finds more of the true neighbours
+            entry_points (int): Random rows the walk starts from
+            exclude (int): Row id never returned, e.g. the query's own row
+
+        Returns:
+            tuple: (indices, scores) sorted by descending score
+        """
+        n = self.matrix.shape[0]
+        rng = np.random.default_rng(self.seed)
+        vector_t = vector.T.tocsc()
+
+        def score(rows):
+            return np.asarray((self.matrix[rows] @ vector_t).todense()).ravel()
+
+        visited = np.zeros(n, dtype=bool)
+        rows = rng.choice(n, size=min(entry_points, n), replace=False)
+        visited[rows] = True
+        row_scores = score(rows)
+        expanded = np.zeros(len(rows), dtype=bool)
+        while True:
+            # keep the beam best
+            order = np.lexsort((rows, -row_scores))[:beam]
+            rows, row_scores, expanded = rows[order], row_scores[order], expanded[order]
+            pending = np.flatnonzero(~expanded)
+            if len(pending) == 0:
+                break
+            # expand every unexpanded row of the beam in one step, scoring
+            # all their unseen neighbours with a single product
+            expanded[pending] = True
+            neighbors = np.unique(self.indices[rows[pending]])
+            neighbors = neighbors[~visited[neighbors]]
+            visited[neighbors] = True
+            rows = np.concatenate([rows, neighbors])
+            row_scores = np.concatenate([row_scores, score(neighbors)])
+            expanded = np.concatenate([expanded, np.zeros(len(neighbors), dtype=bool)])
+
+        if exclude is not None:
+            keep = rows != exclude
+            rows, row_scores = rows[keep], row_scores[keep]
+        return rows[:k], row_scores[:k]
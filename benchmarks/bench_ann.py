@@ -0,0 +1,97 @@
+"""
+Recall@10 against latency of the approximate neighbour graph versus the
+exact recommender index.
+
+The catalogue is main_data.csv merged with the other catalogues under
+datasets/, the larger catalogue the graph backend is meant for. Recall
+counts a returned title as a hit when it scores at least the exact 10th
+best score, so ties at the boundary are not penalised. Run from the
+repository root:
+
+    python -m benchmarks.bench_ann [--queries 200] [--samples 8 12 16] [--beams 16 32 64]
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import normalize
+
+from ann import NeighborGraph
+from recommender import NEIGHBORS_K, combine_features, neighbor_rows, top_k, vectorize
+
+
+CATALOGUES = [
+    "main_data.csv",
+    "datasets/final_data.csv",
+    "datasets/new_data.csv",
+    "datasets/movie_metadata.csv",
+]
+
+
+def load_matrix(paths):
+    texts = pd.concat([combine_features(pd.read_csv(path)) for path in paths], ignore_index=True)
+    return normalize(vectorize(texts, []), norm="l2").tocsr()
+
+
+def recall(scores, exact_scores):
+    """Share of returned neighbours scoring at least the exact k-th score"""
+    k = exact_scores.shape[-1]
+    return float(np.mean(np.sum(scores[..., :k] >= exact_scores[..., -1:] - 1e-6, axis=-1) / k))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--samples", type=int, nargs="+", default=[8, 12, 16])
+    parser.add_argument("--beams", type=int, nargs="+", default=[16, 32, 64])
+    args = parser.parse_args()
+
+    matrix = load_matrix(CATALOGUES)
+    n = matrix.shape[0]
+    print(f"{n} titles x {matrix.shape[1]} terms, {NEIGHBORS_K} neighbours per title")
+
+    start = time.perf_counter()
+    exact_indices, exact_scores = neighbor_rows(matrix, np.arange(n), NEIGHBORS_K)
+    exact_build = time.perf_counter() - start
+    exact_top10 = exact_scores[:, :10]
+
+    print(f"\nindex build          {'seconds':>8} {'recall@10':>10}")
+    print(f"  exact              {exact_build:8.2f} {1:10.3f}")
+    graph = None
+    for sample in args.samples:
+        start = time.perf_counter()
+        graph = NeighborGraph(NEIGHBORS_K, sample=sample).fit(matrix)
+        build = time.perf_counter() - start
+        print(f"  graph sample={sample:<4} {build:8.2f} {recall(graph.scores, exact_top10):10.3f}")
+
+    # queries for a vector that is not looked up in the index, the way a
+    # newly added title or a profile of several titles would be scored
+    rows = np.random.default_rng(0).choice(n, size=min(args.queries, n), replace=False)
+    matrix_t = matrix.T.tocsr()
+
+    def exact_query(i):
+        row_scores = (matrix[i] @ matrix_t).toarray().ravel()
+        row_scores[i] = -np.inf
+        return top_k(row_scores, 10)
+
+    cases = {"exact": exact_query}
+    for beam in args.beams:
+        cases[f"graph beam={beam}"] = lambda i, beam=beam: graph.query(
+            matrix[i], 10, beam=beam, exclude=i
+        )
+
+    print(f"\nsingle query         {'median ms':>9} {'recall@10':>10}")
+    for name, query in cases.items():
+        timings, hits = [], []
+        for i in rows:
+            start = time.perf_counter()
+            _, scores = query(i)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits.append(recall(np.asarray(scores)[None, :], exact_top10[i][None, :]))
+        print(f"  {name:18} {statistics.median(timings):9.2f} {np.mean(hits):10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Per-call latency of creating API clients on every call versus reusing them.
+
+Both APIs are served by a local stub server, so the numbers measure client
+construction, discovery document parsing and connection setup rather than
+the network. Run from the repository root:
+
+    python -m benchmarks.bench_api_clients [--calls 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import googleapiclient
+from googleapiclient.discovery import build
+from openai import OpenAI
+
+
+DISCOVERY_DOCUMENT = os.path.join(
+    os.path.dirname(googleapiclient.__file__),
+    "discovery_cache",
+    "documents",
+    "youtube.v3.json",
+)
+
+SEARCH_RESPONSE = {
+    "items": [
+        {
+            "id": {"videoId": f"video{i}"},
+            "snippet": {"title": f"Review {i}", "channelTitle": "Stub Channel"},
+        }
+        for i in range(3)
+    ]
+}
+
+CHAT_RESPONSE = {
+    "id": "chatcmpl-stub",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-3.5-turbo",
+    "choices": [
+        {
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {
+                "role": "assistant",
+                "content": "1. A stub summary.\n2. Positive\n3. 0.8",
+            },
+        }
+    ],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+def start_stub_server():
+    """Serve the YouTube discovery document, search and chat completions locally"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), None)
+    root_url = f"http://127.0.0.1:{server.server_port}/"
+    with open(DISCOVERY_DOCUMENT) as f:
+        discovery = json.load(f)
+    discovery["rootUrl"] = root_url
+    discovery["baseUrl"] = root_url
+    discovery_body = json.dumps(discovery).encode()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        # keep-alive, so reused clients can reuse their connection; without
+        # TCP_NODELAY the split header/body writes stall on delayed ACKs
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def send_json(self, body):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith("/discovery"):
+                self.send_json(discovery_body)
+            else:
+                self.send_json(SEARCH_RESPONSE)
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_json(CHAT_RESPONSE)
+
+        def log_message(self, format, *args):
+            pass
+
+    server.RequestHandlerClass = StubHandler
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, root_url
+
+
+def time_calls(fn, calls):
+    fn()  # warm up imports and the first connection
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    server, root_url = start_stub_server()
+    discovery_url = root_url + "discovery/{api}/{apiVersion}"
+    os.environ["YOUTUBE_API_KEY"] = "stub"
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = root_url + "v1"
+    os.environ["YOUTUBE_DISCOVERY_URL"] = discovery_url
+    os.environ["YOUTUBE_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "store.sqlite3")
+
+    from youtube_sentiment import YouTubeSentiment
+
+    analyzer = YouTubeSentiment()
+    messages = [{"role": "user", "content": "Review transcript"}]
+
+    def youtube_search(youtube):
+        youtube.search().list(part="snippet", maxResults=3, q="stub", type="video").execute()
+
+    cases = {
+        # what search_youtube_reviews() used to do, with the bundled
+        # discovery document and with one fetched over HTTP
+        "youtube: build() per call, bundled discovery": lambda: youtube_search(
+            build(
+                "youtube",
+                "v3",
+                developerKey="stub",
+                client_options={"api_endpoint": root_url},
+            )
+        ),
+        "youtube: build() per call, fetched discovery": lambda: youtube_search(
+            build(
+                "youtube",
+                "v3",
+                developerKey="stub",
+                discoveryServiceUrl=discovery_url,
+                static_discovery=False,
+                cache_discovery=False,
+            )
+        ),
+        "youtube: reused client": lambda: analyzer.search_youtube_reviews("stub"),
+        # what analyze_with_openai() used to do
+        "openai: OpenAI() per call": lambda: OpenAI(
+            api_key="stub"
+        ).chat.completions.create(model="gpt-3.5-turbo", messages=messages),
+        "openai: reused client": lambda: analyzer.analyze_with_openai(
+            "Review transcript", "stub"
+        ),
+    }
+
+    print(f"{'case':48} {'median ms':>10} {'mean ms':>10}")
+    for name, fn in cases.items():
+        timings = time_calls(fn, args.calls)
+        print(
+            f"{name:48} {statistics.median(timings):10.2f} {statistics.mean(timings):10.2f}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Parse time and memory of IMDB review extraction strategies.
+
+Compares the full BeautifulSoup tree that recommend() used to build, a
+SoupStrainer restricted BeautifulSoup parse, and the lxml iterparse path in
+imdb_reviews.extract_reviews. Pass saved IMDB review pages as fixtures, or
+let the benchmark generate a page with the same structure. Run from the
+repository root:
+
+    python -m benchmarks.bench_review_extraction [page.html ...] [--runs 20]
+
+Peak memory is read from /proc, so it is only reported on Linux.
+"""
+import argparse
+import multiprocessing
+import random
+import statistics
+import time
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from imdb_reviews import REVIEW_CLASS, extract_reviews
+
+
+WORDS = "movie plot acting great terrible story scenes director cast ending boring loved".split()
+
+
+def generate_page(reviews=25, seed=0):
+    """An IMDB like reviews page: heavy head and chrome, nested review cards"""
+    rng = random.Random(seed)
+    parts = ["<!DOCTYPE html><html><head><title>User reviews</title>"]
+    parts += [f"<script>var chunk{i} = {list(range(200))};</script>" for i in range(40)]
+    parts += [f"<style>.c{i} {{ color: #{i:06x}; }}</style>" for i in range(200)]
+    parts.append("</head><body><nav>")
+    parts += [f'<a class="nav-link" href="/x/{i}">Link {i}</a>' for i in range(300)]
+    parts.append("</nav><main><section>")
+    for i in range(reviews):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 400)))
+        if i % 5 == 0:
+            # multi paragraph reviews carry tags, which .string skips
+            text = text.replace(" loved ", " loved<br/><br/>")
+        parts.append(
+            '<article class="user-review-item"><div class="ipc-list-card__content">'
+            f'<div class="review-title"><h3>Review {i}</h3></div>'
+            '<div class="ipc-html-content ipc-html-content--base">'
+            f'<div class="{REVIEW_CLASS}">{text}</div></div>'
+            '<div class="rating"><span>8/10</span></div></div></article>'
+        )
+    parts.append("</section></main><footer>")
+    parts += [f"<p>Footer line {i}</p>" for i in range(300)]
+    parts.append("</footer></body></html>")
+    return "".join(parts).encode()
+
+
+def beautifulsoup_full(content):
+    soup = BeautifulSoup(content, "lxml")
+    soup_result = soup.find_all("div", {"class": REVIEW_CLASS})
+    return [str(reviews.string) for reviews in soup_result if reviews.string]
+
+
+def beautifulsoup_strainer(content):
+    only_reviews = SoupStrainer("div", {"class": REVIEW_CLASS})
+    soup = BeautifulSoup(content, "lxml", parse_only=only_reviews)
+    soup_result = soup.find_all("div", {"class": REVIEW_CLASS})
+    return [str(reviews.string) for reviews in soup_result if reviews.string]
+
+
+METHODS = {
+    "BeautifulSoup full tree (before)": beautifulsoup_full,
+    "BeautifulSoup + SoupStrainer": beautifulsoup_strainer,
+    "lxml iterparse (extract_reviews)": extract_reviews,
+}
+
+
+def read_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def measure_memory(name, content, queue):
+    # runs in a fresh interpreter; writing 5 to clear_refs resets the peak
+    # RSS (VmHWM) so the peak measured belongs to this parse alone
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = read_status("VmRSS")
+    METHODS[name](content)
+    queue.put(max(0, read_status("VmHWM") - baseline))
+
+
+def peak_memory(name, content):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=measure_memory, args=(name, content, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("fixtures", nargs="*", help="saved IMDB review pages")
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = {}
+    for path in args.fixtures:
+        with open(path, "rb") as f:
+            pages[path] = f.read()
+    if not pages:
+        pages["generated page"] = generate_page()
+
+    for label, content in pages.items():
+        expected = beautifulsoup_full(content)
+        print(f"{label}: {len(content) / 1024:.0f} KB, {len(expected)} reviews")
+        print(f"  {'method':34} {'median ms':>10} {'peak MB':>9}  same output")
+        for name, method in METHODS.items():
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                reviews = method(content)
+                timings.append((time.perf_counter() - start) * 1000)
+            memory = peak_memory(name, content) / (1024 * 1024)
+            print(
+                f"  {name:34} {statistics.median(timings):10.2f} {memory:9.1f}  {reviews == expected}"
+            )
+
+
+if __name__ == "__main__":
+    main()
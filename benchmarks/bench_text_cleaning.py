@@ -0,0 +1,82 @@
+"""
+Throughput of the per-string clean_text() the analyzers used to run versus
+the batch sentiment_model.clean_texts.
+
+Tweets are the sample tweets of TwitterSentiment with URLs, mentions,
+numbers and emoji mixed in, or lines of a text file. Run from the
+repository root:
+
+    python -m benchmarks.bench_text_cleaning [tweets.txt] [--size 10000] [--runs 10]
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from sentiment_model import clean_texts
+from social_media import TwitterSentiment
+
+
+def clean_text(text):
+    """The cleaner TwitterSentiment and YouTubeSentiment used to call per text"""
+    # Remove URLs
+    text = re.sub(r"http\S+", "", text)
+    # Remove special characters and numbers
+    text = re.sub(r"[^a-zA-Z\s]", "", text)
+    # Remove extra spaces
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+def per_string(texts):
+    return [clean_text(text) for text in texts]
+
+
+def generate_tweets(size, seed=0):
+    rng = random.Random(seed)
+    analyzer = TwitterSentiment.__new__(TwitterSentiment)
+    templates = analyzer.get_sample_tweets("Inception")
+    extras = ["https://t.co/{n}", "@user{n}", "{n}/10", "\U0001f600", "café", "!!!", "\n"]
+    tweets = []
+    for n in range(size):
+        words = rng.choice(templates).split(" ")
+        for _ in range(3):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(extras).format(n=n))
+        tweets.append(" ".join(words))
+    return tweets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("tweets", nargs="?", help="text file, one tweet per line")
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.tweets:
+        with open(args.tweets, encoding="utf-8", errors="replace") as f:
+            tweets = [line.rstrip("\n") for line in f][: args.size]
+    else:
+        tweets = generate_tweets(args.size)
+
+    expected = per_string(tweets)
+    print(f"{len(tweets)} tweets")
+    print(f"{'method':36} {'median ms':>10} {'tweets/s':>12}  same output")
+    for name, method in {
+        "clean_text per string (before)": per_string,
+        "clean_texts batch": clean_texts,
+    }.items():
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            cleaned = method(tweets)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        print(
+            f"{name:36} {median * 1000:10.1f} {len(tweets) / median:12.0f}  {cleaned == expected}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    Thread safe LRU cache whose entries expire after a time to live.
+
+    get_or_compute() also coalesces concurrent misses: while one caller
+    computes a key, every other caller asking for the same key waits for
+    that result instead of starting its own computation.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _lookup(self, key):
+        # caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, ttl=None):
+        # caller holds the lock
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            found, value = self._lookup(key)
+        return value if found else default
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def get_or_compute(self, key, compute, ttl=None):
+        """
+        Return the cached value for key, computing it with compute() on a miss.
+
+        Exceptions from compute() or ttl() are raised to every waiting
+        caller and are not cached. ttl, if given, is called with the computed value and
+        returns the seconds to keep it instead of self.ttl, 0 to not cache
+        it at all (concurrent callers still share it).
+        """
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                return value
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+            value_ttl = ttl(value) if ttl else None
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            with self._lock:
+                self._store(key, value, value_ttl)
+        finally:
+            # waiters are resolved above whatever happens, and the next
+            # caller never finds a stale in-flight entry
+            with self._lock:
+                self._inflight.pop(key, None)
+        return value
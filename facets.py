@@ -0,0 +1,98 @@
+import re
+
+import numpy as np
+
+from title_index import normalize_title
+
+
+# other spellings of a genre, as normalize_title() keys: main_data.csv has
+# both "Sci-Fi" and "Science Fiction"
+GENRE_ALIASES = {"science fiction": "sci fi", "scifi": "sci fi"}
+
+# genres of several words, kept as one key instead of word by word
+MULTI_WORD_GENRES = ("sci fi", "tv movie", "film noir", "reality tv", "game show")
+
+
+def genre_keys(value):
+    """
+    Normalised genres of a space separated genres value, aliases resolved:
+    "Action Science Fiction" and "Action Sci-Fi" both give
+    ["sci fi", "action"].
+    """
+    text = normalize_title(value)
+    for alias, genre in GENRE_ALIASES.items():
+        text = re.sub(rf"\b{alias}\b", genre, text)
+    keys = []
+    for genre in MULTI_WORD_GENRES:
+        text, found = re.subn(rf"\b{genre}\b", " ", text)
+        if found:
+            keys.append(genre)
+    return keys + text.split()
+
+
+class FacetIndex:
+    """
+    Inverted indexes from genre, director and actor to catalogue rows.
+
+    Built once per engine from the catalogue columns. mask() turns a set of
+    filters into one boolean array over the rows, so they can be applied
+    to the scores before top-k selection instead of filtering afterwards.
+    Values are matched on their normalize_title() form, genres also
+    through GENRE_ALIASES (see genre_keys).
+    """
+
+    def __init__(self, genres, directors, actors):
+        """
+        Args:
+            genres (np.ndarray): Space separated genres of every row
+            directors (np.ndarray): Director of every row
+            actors (np.ndarray): N x 3 actor names
+        """
+        self.size = len(genres)
+        self.genres = self._postings(
+            (row, genre) for row, value in enumerate(genres) for genre in genre_keys(value)
+        )
+        self.directors = self._postings(enumerate(directors))
+        self.actors = self._postings(
+            (row, actor) for row, names in enumerate(actors) for actor in names
+        )
+
+    @staticmethod
+    def _postings(pairs):
+        postings = {}
+        for row, value in pairs:
+            key = normalize_title(value)
+            if key:
+                postings.setdefault(key, []).append(row)
+        return {key: np.unique(np.array(rows, dtype=np.int32)) for key, rows in postings.items()}
+
+    def _rows(self, postings, values):
+        """Rows having any of the values"""
+        found = [postings.get(normalize_title(value)) for value in values]
+        found = [rows for rows in found if rows is not None]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int32)
+
+    def mask(self, genres=(), directors=(), actors=()):
+        """
+        Rows passing every filter given: all of the genres, any of the
+        directors and any of the actors. "Science Fiction" and "Sci-Fi"
+        find the same rows, and a value listing several genres, such as
+        "Action Comedy", needs each of them.
+
+        Returns:
+            np.ndarray: boolean mask over the rows, None without any filter
+        """
+        if not (genres or directors or actors):
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        for genre in genres:
+            for key in genre_keys(genre):
+                allowed = np.zeros(self.size, dtype=bool)
+                allowed[self._rows(self.genres, [key])] = True
+                mask &= allowed
+        for postings, values in ((self.directors, directors), (self.actors, actors)):
+            if values:
+                allowed = np.zeros(self.size, dtype=bool)
+                allowed[self._rows(postings, values)] = True
+                mask &= allowed
+        return mask
@@ -0,0 +1,152 @@
+import os
+import time
+from io import BytesIO
+import requests
+from lxml import etree
+from requests.adapters import HTTPAdapter
+
+from cache import TTLCache
+
+
+REVIEWS_URL = "https://www.imdb.com/title/{imdb_id}/reviews/?ref_=tt_ov_rt"
+
+# class of the <div> holding the text of each user review
+REVIEW_CLASS = "ipc-html-content-inner-div"
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36"
+
+
+def element_string(element):
+    """
+    The text of an element the way BeautifulSoup's .string finds it: its
+    text if it has no child tags, else the .string of its only child when
+    there is no text around that child, else None.
+    """
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return element_string(element[0])
+    return None
+
+
+def is_review(element):
+    return REVIEW_CLASS in (element.get("class") or "").split()
+
+
+def extract_reviews(content):
+    """
+    Return the review texts of an IMDB reviews page.
+
+    The page is streamed through lxml's iterparse, which only reports <div>
+    elements and each one is cleared once read, instead of building a
+    complete BeautifulSoup tree and searching it. Divs inside a review div
+    are kept until the review is read. As with BeautifulSoup's .string, a
+    review counts if it holds plain text, or a single child tag that does
+    (see element_string).
+    """
+    reviews = []
+    for _, element in etree.iterparse(
+        BytesIO(content), events=("end",), tag="div", html=True, recover=True
+    ):
+        if is_review(element):
+            text = element_string(element)
+            if text:
+                reviews.append(text)
+        if any(is_review(ancestor) for ancestor in element.iterancestors("div")):
+            continue
+        # drop what has been read so the tree never holds the whole page
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    return reviews
+
+
+class IMDBReviews:
+    """
+    Scrapes and classifies the IMDB user reviews of a movie.
+
+    Requests go through one pooled keep-alive session. Classified reviews
+    are cached per imdb_id: within fresh_ttl they are served without any
+    request, after that the page is revalidated with If-None-Match /
+    If-Modified-Since and a 304 reuses the cached result without
+    downloading or parsing the page again.
+    """
+
+    def __init__(self, sentiment_model, timeout=10):
+        self.sentiment_model = sentiment_model
+        self.timeout = timeout
+        self.fresh_ttl = int(os.environ.get("IMDB_CACHE_TTL", 60 * 60))
+
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+
+        # entries outlive fresh_ttl so their validators can still be used
+        self.pages = TTLCache(
+            maxsize=int(os.environ.get("IMDB_CACHE_SIZE", 512)),
+            ttl=7 * 24 * 60 * 60,
+        )
+
+    def classify(self, reviews_list):
+        """
+        Returns:
+            tuple: (movie_reviews, reviews_status) where movie_reviews maps each
+                review to "Good" or "Bad" and reviews_status lists every label
+        """
+        reviews_status = []  # list of comments (good or bad)
+        if reviews_list and self.sentiment_model is not None:
+            # passing all the reviews to our model as a single batch
+            labels, _ = self.sentiment_model.score(reviews_list)
+            reviews_status = ["Good" if label else "Bad" for label in labels]
+
+        # combining reviews and comments into a dictionary
+        movie_reviews = {
+            reviews_list[i]: reviews_status[i] for i in range(len(reviews_status))
+        }
+        return movie_reviews, reviews_status
+
+    def get_reviews(self, imdb_id):
+        """
+        Scrape the IMDB user reviews of a movie and classify them.
+
+        Returns:
+            tuple: (movie_reviews, reviews_status), empty if the page could
+                not be retrieved
+        """
+        entry = self.pages.get(imdb_id)
+        if entry is not None and time.time() - entry["fetched_at"] < self.fresh_ttl:
+            return entry["reviews"]
+
+        url = REVIEWS_URL.format(imdb_id=imdb_id)
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        # web scraping to get user reviews from IMDB site
+        print(f"calling imdb api: {url}")
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        print(response.status_code)
+
+        if response.status_code == 304 and entry is not None:
+            self.pages.set(imdb_id, {**entry, "fetched_at": time.time()})
+            return entry["reviews"]
+
+        if response.status_code != 200:
+            print("Failed to retrieve reviews")
+            return {}, []
+
+        reviews = self.classify(extract_reviews(response.content))
+        self.pages.set(
+            imdb_id,
+            {
+                "reviews": reviews,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": time.time(),
+            },
+        )
+        return reviews
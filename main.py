@@ -1,18 +1,17 @@
 from email.mime import application
-import numpy as np
-import pandas as pd
 from flask import (
     Flask,
+    Response,
     render_template,
     request,
     jsonify,
+    stream_with_context,
 )  # Added jsonify for API responses
 import json
-from bs4 import BeautifulSoup
-import pickle
-import requests
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 
 # NEW IMPORT: Import TwitterSentiment class
@@ -21,48 +20,96 @@ from social_media import TwitterSentiment
 # Add this import at the top of main.py, after the TwitterSentiment import
 from youtube_sentiment import YouTubeSentiment
 
+from imdb_reviews import IMDBReviews
+from recommender import NO_MATCH_MESSAGE, NOT_FOUND_MESSAGE, batch_records, get_engine
+from sentiment_store import MIN_REVIEWS, open_sentiment_store, sentiment_score
+from sentiment_model import get_sentiment_model
 
-# load the nlp model and tfidf vectorizer from disk
-filename = "nlp_model.pkl"
-clf = pickle.load(open(filename, "rb"))
-vectorizer = pickle.load(open("tranform.pkl", "rb"))
 
-# NEW: Initialize Twitter sentiment analyzer
-twitter_analyzer = TwitterSentiment()
-
-# Initialize YouTube sentiment analyzer after the Twitter analyzer
-youtube_analyzer = YouTubeSentiment()
+# seconds a source may take before the page is rendered without it
+SOURCE_TIMEOUTS = {"imdb": 10, "twitter": 10, "youtube": 25}
 
+# threads per network bound sentiment source, shared by every request. Each
+# source has its own pool: a timed out lookup keeps its thread until it
+# finishes, and slow YouTube lookups must not leave IMDB jobs queued
+# behind them until they time out without having started.
+SOURCE_WORKERS = {"imdb": 8, "twitter": 4, "youtube": 8}
 
-def create_similarity():
-    data = pd.read_csv("main_data.csv")
-    # creating a count matrix
-    cv = CountVectorizer()
-    count_matrix = cv.fit_transform(data["comb"])
-    # creating a similarity score matrix
-    similarity = cosine_similarity(count_matrix)
-    return data, similarity
+# load the nlp model and tfidf vectorizer from disk, shared with the
+# Twitter and YouTube analyzers
+sentiment_model = get_sentiment_model()
 
+# NEW: Initialize Twitter sentiment analyzer
+twitter_analyzer = TwitterSentiment()
 
-def rcmd(m):
-    m = m.lower()
-    try:
-        data.head()
-        similarity.shape
-    except:
-        data, similarity = create_similarity()
-    if m not in data["movie_title"].unique():
-        return "Sorry! The movie you requested is not in our database. Please check the spelling or try with some other movies"
-    else:
-        i = data.loc[data["movie_title"] == m].index[0]
-        lst = list(enumerate(similarity[i]))
-        lst = sorted(lst, key=lambda x: x[1], reverse=True)
-        lst = lst[1:11]  # excluding first item since it is the requested movie itself
-        l = []
-        for i in range(len(lst)):
-            a = lst[i][0]
-            l.append(data["movie_title"][a])
-        return l
+# Initialize YouTube sentiment analyzer after the Twitter analyzer
+youtube_analyzer = YouTubeSentiment(lookups=SOURCE_WORKERS["youtube"])
+
+# one pool per source, see SOURCE_WORKERS
+source_executors = {
+    name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"sentiment-{name}")
+    for name, workers in SOURCE_WORKERS.items()
+}
+
+# IMDB user reviews through a pooled session and a revalidating page cache
+imdb_reviews = IMDBReviews(sentiment_model, timeout=SOURCE_TIMEOUTS["imdb"])
+
+# per-movie review sentiment precomputed by `python sentiment_store.py build`
+sentiment_store = open_sentiment_store()
+
+
+# build the recommendation engine once per process; with `gunicorn --preload`
+# it is built in the master and shared copy-on-write by every worker. Requests
+# call get_engine() so a version written by `python recommender.py update`
+# is picked up without a restart.
+get_engine()
+
+
+def rcmd(m, k=10, filters=None):
+    """
+    Recommendations for a title, or a message starting with "Sorry!".
+
+    filters holds lists of genres, directors, actors and titles to
+    exclude, see RecommendationEngine.facet_mask.
+    """
+    engine = get_engine()
+    mask = engine.facet_mask(**filters) if filters else None
+    l = engine.recommend(m, k, mask=mask)
+    if l is None:
+        suggestions = engine.suggest(m)
+        if suggestions:
+            return f"{NOT_FOUND_MESSAGE}. Did you mean: {', '.join(suggestions)}?"
+        return NOT_FOUND_MESSAGE
+    if not l and mask is not None:
+        return NO_MATCH_MESSAGE
+    return l
+
+
+# most titles accepted by one /recommend_batch request
+BATCH_LIMIT = int(os.environ.get("RECOMMENDER_BATCH_LIMIT", 10000))
+
+
+# request fields read by read_filters, see RecommendationEngine.facet_mask
+FILTER_FIELDS = ("genres", "directors", "actors", "exclude")
+
+
+def read_filters(values):
+    """
+    Facet filters from a request, each field given as a list (JSON) or
+    repeated form fields, e.g. genres=Action&genres=Comedy.
+    """
+    filters = {}
+    for field in FILTER_FIELDS:
+        if hasattr(values, "getlist"):
+            selected = values.getlist(field)
+        else:
+            selected = values.get(field) or []
+            if not isinstance(selected, list):
+                selected = [selected]
+        selected = [str(value) for value in selected if str(value).strip()]
+        if selected:
+            filters[field] = selected
+    return filters
 
 
 # converting list of string to list (eg. "["abc","def"]" to ["abc","def"])
@@ -73,9 +120,124 @@ def convert_to_list(my_list):
     return my_list
 
 
-def get_suggestions():
-    data = pd.read_csv("main_data.csv")
-    return list(data["movie_title"].str.capitalize())
+def format_suggestion(title):
+    return title.capitalize()
+
+
+def empty_twitter_sentiment(error):
+    return {
+        "twitter": {
+            "positive": 0,
+            "neutral": 0,
+            "negative": 0,
+            "sentiment_score": 0,
+            "positive_examples": [],
+            "neutral_examples": [],
+            "negative_examples": [],
+            "source": "Twitter",
+            "content_count": 0,
+            "error": error,
+        },
+        "overall_sentiment": {
+            "score": 0,
+            "total_positive": 0,
+            "total_neutral": 0,
+            "total_negative": 0,
+        },
+    }
+
+
+def empty_youtube_sentiment(error):
+    return {
+        "youtube": {
+            "reviews": [],
+            "sentiment_score": 0,
+            "positive": 0,
+            "neutral": 0,
+            "negative": 0,
+            "content_count": 0,
+            "positive_examples": [],
+            "neutral_examples": [],
+            "negative_examples": [],
+            "source": "YouTube",
+            "error": error,
+        }
+    }
+
+
+def get_imdb_sentiment(title, imdb_id):
+    """
+    IMDB reviews and the IMDB sentiment score (0-10 scale) of a movie.
+
+    Served from the offline sentiment store while its entry is fresh and
+    holds at least MIN_REVIEWS reviews; otherwise the reviews are scraped
+    live. Live results are not written to the store, IMDBReviews caches
+    and revalidates them on its own, shorter IMDB_CACHE_TTL schedule.
+    Store entries come from a review corpus, not IMDB, and carry the
+    corpus name so the page can say where they come from.
+
+    Returns:
+        tuple: (movie_reviews, imdb_sentiment_score, reviews_source),
+            reviews_source None for IMDB reviews
+    """
+    entry = sentiment_store.get_fresh(title) if sentiment_store else None
+    # entries from a store built with a lower --min-reviews are too thin
+    # to stand for the movie, and ones an older version wrote back from
+    # live scrapes would hide IMDB's own revalidation
+    if (
+        entry is not None
+        and entry["source"] != "imdb"
+        and entry["positive"] + entry["negative"] >= MIN_REVIEWS
+    ):
+        return dict(entry["examples"]), entry["sentiment_score"], entry["source"]
+
+    movie_reviews, reviews_status = imdb_reviews.get_reviews(imdb_id)
+    imdb_positive = reviews_status.count("Good")
+    return movie_reviews, sentiment_score(imdb_positive, len(reviews_status)), None
+
+
+def start_sentiment_sources(title, imdb_id):
+    """Submit the IMDB, Twitter and YouTube lookups, each to its own pool"""
+    return {
+        "imdb": source_executors["imdb"].submit(get_imdb_sentiment, title, imdb_id),
+        "twitter": source_executors["twitter"].submit(
+            twitter_analyzer.get_movie_sentiment, title
+        ),
+        "youtube": source_executors["youtube"].submit(
+            youtube_analyzer.get_youtube_sentiment, title
+        ),
+    }
+
+
+def collect_sentiment_sources(futures):
+    """
+    Wait for the sentiment sources, each up to its own SOURCE_TIMEOUTS budget.
+
+    Budgets run from the same start, so the page waits for the slowest
+    source rather than the sum of all of them. A source that raises or
+    times out is replaced by an empty result; a timed out lookup keeps
+    running in the pool and is simply not waited for.
+    """
+    fallbacks = {
+        "imdb": lambda error: ({}, 0, None),
+        "twitter": empty_twitter_sentiment,
+        "youtube": empty_youtube_sentiment,
+    }
+    start_time = time.monotonic()
+    results = {}
+    for name, future in futures.items():
+        remaining = max(0, start_time + SOURCE_TIMEOUTS[name] - time.monotonic())
+        try:
+            results[name] = future.result(timeout=remaining)
+        except FutureTimeoutError:
+            app.logger.warning(
+                f"{name} sentiment timed out after {SOURCE_TIMEOUTS[name]} seconds"
+            )
+            results[name] = fallbacks[name](f"{name} timed out")
+        except Exception as e:
+            app.logger.error(f"Error getting {name} sentiment: {str(e)}")
+            results[name] = fallbacks[name](str(e))
+    return results
 
 
 app = Flask(__name__)
@@ -84,14 +246,22 @@ app = Flask(__name__)
 @app.route("/")
 @app.route("/home")
 def home():
-    suggestions = get_suggestions()
-    return render_template("home.html", suggestions=suggestions)
+    return render_template("home.html")
+
+
+@app.route("/search")
+def search():
+    """Prefix search over the catalogue titles for autocomplete"""
+    query = request.args.get("q", "")
+    limit = min(max(request.args.get("limit", 5, type=int), 1), 50)
+    return jsonify([format_suggestion(title) for title in get_engine().search(query, limit)])
 
 
 @app.route("/similarity", methods=["POST"])
 def similarity():
     movie = request.form["name"]
-    rc = rcmd(movie)
+    k = request.form.get("k", 10, type=int)
+    rc = rcmd(movie, max(1, k), read_filters(request.form))
     if type(rc) == type("string"):
         return rc
     else:
@@ -99,6 +269,92 @@ def similarity():
         return m_str
 
 
+@app.route("/recommend_profile", methods=["POST"])
+def recommend_profile():
+    """
+    Recommendations for several liked (and optionally disliked) titles.
+
+    Expects JSON {"liked": [...], "disliked": [...], "k": 10}, optionally
+    with "genres", "directors", "actors" and "exclude" lists to filter on,
+    and returns {"recommendations": [...], "unknown": [...]}, unknown
+    listing the titles not in the catalogue with close matches as
+    suggestions.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required"}), 400
+    liked = data.get("liked") or []
+    disliked = data.get("disliked") or []
+    if not isinstance(liked, list) or not isinstance(disliked, list) or not liked:
+        return jsonify({"error": "A list of liked titles is required"}), 400
+    if not all(isinstance(title, str) for title in liked + disliked):
+        return jsonify({"error": "Titles must be strings"}), 400
+    try:
+        k = min(max(int(data.get("k", 10)), 1), 50)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    engine = get_engine()
+    filters = read_filters(data)
+    titles, unknown = engine.recommend_profile(
+        liked,
+        disliked,
+        k,
+        mask=engine.facet_mask(**filters) if filters else None,
+    )
+    result = {
+        "recommendations": titles,
+        "unknown": [
+            {"title": title, "suggestions": engine.suggest(title)} for title in unknown
+        ],
+    }
+    if not titles:
+        # either no liked title is known or the filters leave nothing
+        unknown_liked = set(unknown) >= set(liked)
+        result["error"] = NOT_FOUND_MESSAGE if unknown_liked else NO_MATCH_MESSAGE
+        return jsonify(result), 404
+    return jsonify(result)
+
+
+@app.route("/recommend_batch", methods=["POST"])
+def recommend_batch():
+    """
+    Recommendations for many titles at once, for offline consumers.
+
+    Expects JSON {"titles": [...], "k": 10}, optionally with "genres",
+    "directors", "actors" and "exclude" lists applied to every title, and
+    streams one JSON object per line (application/x-ndjson) in input
+    order: {"title", "recommendations"}, or {"title", "error",
+    "suggestions"} for a title not in the catalogue.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required"}), 400
+    titles = data.get("titles")
+    if not isinstance(titles, list) or not titles:
+        return jsonify({"error": "A list of titles is required"}), 400
+    if not all(isinstance(title, str) for title in titles):
+        return jsonify({"error": "Titles must be strings"}), 400
+    if len(titles) > BATCH_LIMIT:
+        return jsonify({"error": f"At most {BATCH_LIMIT} titles per request"}), 413
+    try:
+        k = min(max(int(data.get("k", 10)), 1), 50)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"error": "k must be an integer"}), 400
+
+    # one engine for the whole batch, even if a newer version is loaded
+    # while the response is streaming
+    engine = get_engine()
+    filters = read_filters(data)
+    mask = engine.facet_mask(**filters) if filters else None
+
+    def generate():
+        for record in batch_records(engine, titles, k, mask):
+            yield json.dumps(record) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 # NEW ROUTE: Twitter sentiment analysis endpoint
 @app.route("/twitter_sentiment", methods=["POST"])
 def twitter_sentiment():
@@ -168,8 +424,9 @@ def recommend():
     rec_movies = request.form["rec_movies"]
     rec_posters = request.form["rec_posters"]
 
-    # get movie suggestions for auto complete
-    suggestions = get_suggestions()
+    # IMDB, Twitter and YouTube are network bound, so fetch them concurrently
+    # while the rest of the page data is prepared
+    source_futures = start_sentiment_sources(title, imdb_id)
 
     # call the convert_to_list function for every string that needs to be converted to list
     rec_movies = convert_to_list(rec_movies)
@@ -208,56 +465,12 @@ def recommend():
         ]
         for i in range(len(cast_places))
     }
-    print(
-        f"calling imdb api: {'https://www.imdb.com/title/{}/reviews/?ref_=tt_ov_rt'.format(imdb_id)}"
-    )
-    # web scraping to get user reviews from IMDB site
-    url = f"https://www.imdb.com/title/{imdb_id}/reviews/?ref_=tt_ov_rt"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36"
-    }
-
-    response = requests.get(url, headers=headers)
-    print(response.status_code)
-
-    # Initialize movie_reviews
-    movie_reviews = {}
-    reviews_status = []  # Initialize for IMDB sentiment score calculation
-
-    if response.status_code == 200:
-        soup = BeautifulSoup(response.content, "lxml")
-        soup_result = soup.find_all("div", {"class": "ipc-html-content-inner-div"})
-        print(soup_result)
-
-        reviews_list = []  # list of reviews
-        reviews_status = []  # list of comments (good or bad)
-        for reviews in soup_result:
-            if reviews.string:
-                reviews_list.append(reviews.string)
-                # passing the review to our model
-                movie_review_list = np.array([reviews.string])
-                movie_vector = vectorizer.transform(movie_review_list)
-                pred = clf.predict(movie_vector)
-                reviews_status.append("Good" if pred else "Bad")
-
-        # combining reviews and comments into a dictionary
-        movie_reviews = {
-            reviews_list[i]: reviews_status[i] for i in range(len(reviews_list))
-        }
-    else:
-        print("Failed to retrieve reviews")
-
-    # NEW: Calculate IMDB sentiment score (0-10 scale)
-    imdb_positive = (
-        sum(1 for status in reviews_status if status == "Good") if reviews_status else 0
-    )
-    imdb_total = len(reviews_status) if reviews_status else 0
-    imdb_sentiment_score = (
-        round((imdb_positive / imdb_total) * 10, 1) if imdb_total > 0 else 0
-    )
-
-    # NEW: Get Twitter sentiment analysis for the movie
-    twitter_sentiment = twitter_analyzer.get_movie_sentiment(title)
+    # collecting the sentiment sources started above; a source that fails
+    # or runs out of time is rendered empty instead of holding the page
+    sentiment_sources = collect_sentiment_sources(source_futures)
+    movie_reviews, imdb_sentiment_score, reviews_source = sentiment_sources["imdb"]
+    twitter_sentiment = sentiment_sources["twitter"]
+    youtube_sentiment = sentiment_sources["youtube"]
 
     # passing all the data to the html file
     return render_template(
@@ -273,12 +486,13 @@ def recommend():
         genres=genres,
         movie_cards=movie_cards,
         reviews=movie_reviews,
+        reviews_source=reviews_source,
         casts=casts,
         cast_details=cast_details,
         # NEW: Pass Twitter sentiment data to the template
         twitter_sentiment=twitter_sentiment,
         # NEW: Passing YT sentiment data to the template
-        youtube_sentiment=youtube_analyzer.get_youtube_sentiment(title),
+        youtube_sentiment=youtube_sentiment,
         imdb_sentiment_score=imdb_sentiment_score,
     )
 
@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class RateLimit:
+    """
+    Request budget of a rate limited API endpoint, tracked from the
+    x-rate-limit-remaining / x-rate-limit-reset headers of its responses.
+
+    Shared by every thread of the process: callers check wait_time()
+    before a request and skip it while the budget is spent, instead of
+    sleeping until the window resets.
+    """
+
+    def __init__(self, default_backoff=60):
+        # used when a 429 carries no reset header
+        self.default_backoff = default_backoff
+        self.remaining = None  # unknown until the first response
+        self.reset_at = 0.0  # epoch seconds
+        self._lock = threading.Lock()
+
+    def update(self, headers):
+        """Record the budget left after a successful response"""
+        remaining = headers.get("x-rate-limit-remaining")
+        reset = headers.get("x-rate-limit-reset")
+        with self._lock:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = float(reset)
+
+    def exhausted(self, headers=None):
+        """Record a rate limited (429) response"""
+        reset = (headers or {}).get("x-rate-limit-reset")
+        with self._lock:
+            self.remaining = 0
+            self.reset_at = (
+                float(reset) if reset is not None else time.time() + self.default_backoff
+            )
+
+    def wait_time(self):
+        """Seconds until requests may be made again, 0 if they may now"""
+        with self._lock:
+            if self.remaining is None or self.remaining > 0:
+                return 0
+            return max(0.0, self.reset_at - time.time())
@@ -0,0 +1,780 @@
+import argparse
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import normalize
+
+from ann import NeighborGraph
+from facets import FacetIndex
+from title_index import TitleIndex
+
+
+logger = logging.getLogger("recommender")
+
+DATA_PATH = "main_data.csv"
+
+# directory holding the prebuilt index, see `python recommender.py build`;
+# each build or update writes a new version directory inside it and then
+# points the CURRENT file at it
+ARTIFACT_DIR = os.environ.get("RECOMMENDER_ARTIFACT", "artifacts/recommender")
+ARTIFACT_VERSION = 3
+CURRENT_FILE = "CURRENT"
+
+# version directories kept, older ones are deleted after an update
+KEEP_VERSIONS = 3
+
+# seconds between checks of CURRENT for a newer version to reload
+RELOAD_INTERVAL = float(os.environ.get("RECOMMENDER_RELOAD_INTERVAL", 5))
+
+# catalogue columns making up the feature text of a title
+ACTOR_COLUMNS = ["actor_1_name", "actor_2_name", "actor_3_name"]
+FEATURE_COLUMNS = [*ACTOR_COLUMNS, "director_name", "genres"]
+
+# number of neighbours kept per title in the precomputed index
+NEIGHBORS_K = 50
+
+# "exact" scores every pair of titles; "graph" builds an approximate
+# neighbour graph (ann.NeighborGraph), for catalogues too large for the
+# O(N^2) exact build
+BACKENDS = ("exact", "graph")
+BACKEND = os.environ.get("RECOMMENDER_BACKEND", "exact")
+
+# weight of a disliked title's features against a liked one's in a profile
+DISLIKE_WEIGHT = 0.5
+
+# closest titles below this trigram similarity are not worth suggesting
+SUGGESTION_THRESHOLD = 0.3
+
+# upper bound on the dense score block materialised while building the index
+BLOCK_BYTES = 64 * 1024 * 1024
+
+NOT_FOUND_MESSAGE = "Sorry! The movie you requested is not in our database. Please check the spelling or try with some other movies"
+NO_MATCH_MESSAGE = "Sorry! No similar movies match the selected filters"
+
+
+def top_k(scores, k):
+    """
+    Select the k best entries along the last axis of a score array.
+
+    np.argpartition finds the winners in linear time and only those k are
+    sorted, instead of sorting every score. Entries set to -inf are never
+    returned ahead of a finite score, which is how callers exclude rows.
+
+    Args:
+        scores (np.ndarray): 1-D score row or 2-D block of rows
+        k (int): Number of entries to select
+
+    Returns:
+        tuple: (indices, scores) sorted by descending score, lower index
+            first on ties
+    """
+    n = scores.shape[-1]
+    k = max(0, min(k, n))
+    if k == 0:
+        empty = np.zeros((*scores.shape[:-1], 0), dtype=np.intp)
+        return empty, scores[..., :0]
+    top = np.argpartition(scores, n - k, axis=-1)[..., n - k :]
+    top_scores = np.take_along_axis(scores, top, axis=-1)
+    order = np.lexsort((top, -top_scores), axis=-1)
+    return (
+        np.take_along_axis(top, order, axis=-1),
+        np.take_along_axis(top_scores, order, axis=-1),
+    )
+
+
+def neighbor_rows(matrix, rows, k, matrix_t=None):
+    """
+    Compute the top-k cosine neighbours of some rows of a normalised matrix.
+
+    Rows are L2 normalised so a sparse dot product is the cosine similarity.
+    Scores are produced a block of rows at a time so only a
+    (block x N) slab is ever dense instead of the full N x N matrix.
+
+    Args:
+        matrix (scipy.sparse.csr_matrix): N x V L2 normalised rows
+        rows (np.ndarray): Row ids to compute neighbours for
+        k (int): Number of neighbours to keep per row
+        matrix_t (scipy.sparse.csr_matrix): matrix.T as CSR, if already built
+
+    Returns:
+        tuple: (indices, scores) as len(rows) x k int32 / float32 arrays,
+            each row sorted by descending score and never containing the
+            row itself
+    """
+    n = matrix.shape[0]
+    rows = np.asarray(rows, dtype=np.int64)
+    block_size = max(1, BLOCK_BYTES // (4 * n))
+    if matrix_t is None:
+        matrix_t = matrix.T.tocsr()
+
+    indices = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        block_rows = rows[start : start + block_size]
+        block = (matrix[block_rows] @ matrix_t).toarray()
+        # a title is never its own neighbour
+        block[np.arange(len(block_rows)), block_rows] = -np.inf
+        indices[start : start + len(block_rows)], scores[start : start + len(block_rows)] = top_k(
+            block, k
+        )
+    return indices, scores
+
+
+def combine_features(data):
+    """
+    Feature text of catalogue rows: their `comb` column, or the actors,
+    director and genres joined the way main_data.csv was prepared.
+    """
+    if "comb" in data.columns:
+        return data["comb"].fillna("")
+    return data[FEATURE_COLUMNS].fillna("").astype(str).agg(" ".join, axis=1)
+
+
+def facet_columns(data):
+    """
+    Genres, director and N x 3 actors of catalogue rows as string arrays,
+    empty strings where a column is missing.
+    """
+
+    def column(name):
+        if name not in data.columns:
+            return np.full(len(data), "", dtype=str)
+        return data[name].fillna("").astype(str).str.strip().to_numpy(dtype=str)
+
+    actors = np.stack([column(name) for name in ACTOR_COLUMNS], axis=1)
+    return column("genres"), column("director_name"), actors
+
+
+def vectorize(texts, vocabulary):
+    """
+    Term counts of texts over a fixed, append only vocabulary.
+
+    Terms not seen before get new columns at the end, so existing columns
+    keep their meaning and the current matrix only has to grow wider.
+
+    Args:
+        texts (iterable): Feature texts
+        vocabulary (list): Terms in column order, extended in place
+
+    Returns:
+        scipy.sparse.csr_matrix: len(texts) x len(vocabulary) float32 counts
+    """
+    texts = list(texts)
+    analyzer = CountVectorizer().build_analyzer()
+    columns = {term: i for i, term in enumerate(vocabulary)}
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for term in analyzer(text):
+            column = columns.get(term)
+            if column is None:
+                column = columns[term] = len(vocabulary)
+                vocabulary.append(term)
+            rows.append(row)
+            cols.append(column)
+    counts = sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(texts), len(vocabulary)),
+    )
+    counts.sum_duplicates()
+    return counts
+
+
+class RecommendationEngine:
+    """Content based recommender built once and shared by every request"""
+
+    def __init__(
+        self,
+        titles,
+        neighbors,
+        scores,
+        matrix,
+        vocabulary,
+        genres,
+        directors,
+        actors,
+        backend="exact",
+    ):
+        self.titles = titles
+        self.neighbors = neighbors
+        self.scores = scores
+        # L2 normalised term counts and the terms of its columns, kept so
+        # titles can be added without refitting the vocabulary
+        self.matrix = matrix
+        self.vocabulary = vocabulary
+        # how the neighbour lists were built, see BACKENDS
+        self.backend = backend
+        self.genres = genres
+        self.directors = directors
+        self.actors = actors
+        self.title_index = TitleIndex(titles)
+        self.facet_index = FacetIndex(genres, directors, actors)
+
+    @classmethod
+    def from_csv(cls, path=DATA_PATH, k=NEIGHBORS_K, backend=BACKEND):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown recommender backend {backend!r}, expected one of {BACKENDS}")
+        data = pd.read_csv(path)
+        # creating a count matrix
+        vocabulary = []
+        matrix = normalize(vectorize(combine_features(data), vocabulary), norm="l2").tocsr()
+        # keeping only the top-k neighbours of every title
+        n = matrix.shape[0]
+        k = max(0, min(k, n - 1))
+        if backend == "graph":
+            graph = NeighborGraph(k).fit(matrix)
+            neighbors, scores = graph.indices, graph.scores
+        else:
+            neighbors, scores = neighbor_rows(matrix, np.arange(n), k)
+        titles = data["movie_title"].str.strip().to_numpy(dtype=str)
+        return cls(titles, neighbors, scores, matrix, vocabulary, *facet_columns(data), backend)
+
+    def update(self, data):
+        """
+        Return a new engine with catalogue rows added or replaced.
+
+        Rows whose title is already in the catalogue replace that entry,
+        the others are appended. Only the changed rows are vectorised, over
+        the existing vocabulary extended with any new terms, and only
+        their neighbours are computed against the whole matrix. Every other
+        title merges its stored neighbour list with its scores against the
+        changed rows; titles whose list held a replaced row, whose old
+        score is stale, are recomputed in full. The result is the same as
+        a rebuild of the updated catalogue.
+
+        Args:
+            data (pd.DataFrame): movie_title plus comb, or the actor,
+                director and genres columns
+
+        Returns:
+            RecommendationEngine: the updated engine, self is unchanged
+        """
+        n_old, k = self.neighbors.shape
+        vocabulary = list(self.vocabulary)
+        changed_matrix = normalize(
+            vectorize(combine_features(data), vocabulary), norm="l2"
+        ).tocsr()
+
+        titles = list(self.titles)
+        targets = []
+        for title in data["movie_title"].str.strip():
+            row = self.title_index.get(title)
+            if row is None:
+                row = len(titles)
+                titles.append(title)
+            else:
+                titles[row] = title
+            targets.append(row)
+        targets = np.array(targets, dtype=np.int64)
+        n = len(titles)
+
+        # replaced rows keep the facet values of columns the csv leaves
+        # out, e.g. one with only movie_title and comb
+        facets = []
+        replaced_at = targets < n_old
+        columns = (["genres"], ["director_name"], ACTOR_COLUMNS)
+        for old, new, names in zip(
+            (self.genres, self.directors, self.actors), facet_columns(data), columns
+        ):
+            column = np.zeros((n, *old.shape[1:]), dtype=np.result_type(old.dtype, new.dtype))
+            column[:n_old] = old
+            column[targets[~replaced_at]] = new[~replaced_at]
+            present = np.array([name in data.columns for name in names])
+            column.reshape(n, -1)[np.ix_(targets[replaced_at], present)] = new.reshape(
+                len(new), -1
+            )[replaced_at][:, present]
+            facets.append(column)
+
+        # the old matrix only grows wider, then changed rows take their place
+        old_matrix = sp.csr_matrix(
+            (self.matrix.data, self.matrix.indices, self.matrix.indptr),
+            shape=(n_old, len(vocabulary)),
+        )
+        order = np.concatenate([np.arange(n_old), np.zeros(n - n_old, dtype=np.int64)])
+        order[targets] = n_old + np.arange(len(targets))
+        matrix = sp.vstack([old_matrix, changed_matrix], format="csr")[order]
+        matrix_t = matrix.T.tocsr()
+
+        changed = np.unique(targets)
+        replaced = changed[changed < n_old]
+        stale = np.zeros(n, dtype=bool)
+        stale[changed] = True
+        stale[:n_old] |= np.isin(self.neighbors, replaced).any(axis=1)
+        if 4 * len(changed) > n:
+            # a large update is cheaper as a rebuild
+            stale[:] = True
+
+        neighbors = np.empty((n, k), dtype=np.int32)
+        scores = np.empty((n, k), dtype=np.float32)
+        neighbors[:n_old] = self.neighbors
+        scores[:n_old] = self.scores
+
+        rows = np.flatnonzero(stale)
+        neighbors[rows], scores[rows] = neighbor_rows(matrix, rows, k, matrix_t)
+
+        rows = np.flatnonzero(~stale)
+        if len(rows):
+            candidates = np.hstack([neighbors[rows], np.broadcast_to(changed, (len(rows), len(changed)))])
+            candidate_scores = np.hstack(
+                [scores[rows], (matrix[rows] @ matrix_t[:, changed]).toarray()]
+            )
+            # ties go to the lower row id, as in top_k over full rows
+            order = np.lexsort((candidates, -candidate_scores), axis=-1)[:, :k]
+            neighbors[rows] = np.take_along_axis(candidates, order, axis=-1)
+            scores[rows] = np.take_along_axis(candidate_scores, order, axis=-1)
+
+        return RecommendationEngine(
+            np.array(titles, dtype=str),
+            neighbors,
+            scores,
+            matrix,
+            vocabulary,
+            *facets,
+            self.backend,
+        )
+
+    def save(self, path=ARTIFACT_DIR, source=DATA_PATH):
+        """
+        Write the engine as a new version of the artifact at path and make
+        it current.
+
+        The version directory is complete before the CURRENT pointer is
+        atomically replaced to name it, so readers see either the old or
+        the new index, never a half written one. Returns its directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        version_path = tempfile.mkdtemp(prefix=time.strftime("v%Y%m%d-%H%M%S-"), dir=path)
+        arrays = {
+            "titles": self.titles,
+            "neighbors": self.neighbors,
+            "scores": self.scores,
+            "matrix_data": self.matrix.data,
+            "matrix_indices": self.matrix.indices,
+            "matrix_indptr": self.matrix.indptr,
+            "genres": self.genres,
+            "directors": self.directors,
+            "actors": self.actors,
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(version_path, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(version_path, "vocabulary.json"), "w") as f:
+            json.dump(self.vocabulary, f)
+
+        meta = {
+            "version": ARTIFACT_VERSION,
+            "rows": int(self.neighbors.shape[0]),
+            "k": int(self.neighbors.shape[1]),
+            "columns": len(self.vocabulary),
+            "source": source,
+            "backend": self.backend,
+            "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        with open(os.path.join(version_path, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        target = os.path.join(path, CURRENT_FILE)
+        with open(target + ".tmp", "w") as f:
+            f.write(os.path.basename(version_path))
+        os.replace(target + ".tmp", target)
+        prune_versions(path)
+        return version_path
+
+    @classmethod
+    def load(cls, path=ARTIFACT_DIR):
+        """
+        Open the current version of a saved artifact read-only.
+
+        The arrays are np.memmap views onto the files, so every gunicorn
+        worker shares the same page cache copy instead of holding its own.
+        """
+        version = current_version(path)
+        if version is None:
+            raise FileNotFoundError(f"No {CURRENT_FILE} file in {path}")
+        path = os.path.join(path, version)
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != ARTIFACT_VERSION:
+            raise ValueError(
+                f"Unsupported recommender artifact version {meta.get('version')} in {path}"
+            )
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in (
+                "titles",
+                "neighbors",
+                "scores",
+                "matrix_data",
+                "matrix_indices",
+                "matrix_indptr",
+                "genres",
+                "directors",
+                "actors",
+            )
+        }
+        with open(os.path.join(path, "vocabulary.json")) as f:
+            vocabulary = json.load(f)
+        matrix = sp.csr_matrix(
+            (arrays["matrix_data"], arrays["matrix_indices"], arrays["matrix_indptr"]),
+            shape=(meta["rows"], meta["columns"]),
+        )
+        return cls(
+            arrays["titles"],
+            arrays["neighbors"],
+            arrays["scores"],
+            matrix,
+            vocabulary,
+            arrays["genres"],
+            arrays["directors"],
+            arrays["actors"],
+            meta.get("backend", "exact"),
+        )
+
+    def suggest(self, title, n=5):
+        """
+        Return up to n catalogue titles close to a title.
+
+        Only suggested, never resolved automatically: sequels such as
+        "spider-man 2" and "spider-man 3" are near identical by spelling.
+        """
+        rows = [
+            row
+            for row, score in self.title_index.fuzzy(title, n)
+            if score >= SUGGESTION_THRESHOLD
+        ]
+        return self.titles[rows].tolist()
+
+    def search(self, query, n=5):
+        """Return up to n catalogue titles starting with query"""
+        return self.titles[self.title_index.prefix(query, n)].tolist()
+
+    def facet_mask(self, genres=(), directors=(), actors=(), exclude=()):
+        """
+        Boolean mask of the rows passing the filters (see FacetIndex.mask),
+        minus every row carrying one of the excluded titles. None when
+        nothing is filtered.
+        """
+        mask = self.facet_index.mask(genres, directors, actors)
+        rows = [row for title in exclude for row in self.title_index.get_all(title)]
+        if rows:
+            if mask is None:
+                mask = np.ones(len(self.titles), dtype=bool)
+            mask[rows] = False
+        return mask
+
+    def recommend(self, title, k=10, exclude_duplicates=True, mask=None):
+        """
+        Return the k most similar titles, or None if the title is unknown.
+
+        The query row is never its own neighbour. With exclude_duplicates,
+        other catalogue rows carrying the same title are dropped as well, so
+        a duplicated entry can't come back as a recommendation for itself.
+        k is capped by the number of neighbours stored per title.
+
+        With a mask (see facet_mask) only rows it allows are returned. When
+        at least k of the stored neighbours pass, they are the answer, as
+        every other allowed row scores lower; otherwise the catalogue is
+        scored with one sparse product and the mask applied before top_k.
+        """
+        i = self.title_index.get(title)
+        if i is None:
+            return None
+        stored = self._stored_recommendations(i, k, exclude_duplicates, mask)
+        if stored is not None:
+            return stored
+        scores = (self.matrix @ self.matrix[i].T).toarray().ravel()
+        scores[~mask] = -np.inf
+        scores[i] = -np.inf
+        if exclude_duplicates:
+            scores[self.titles == self.titles[i]] = -np.inf
+        candidates, candidate_scores = top_k(scores, k)
+        return self.titles[candidates[np.isfinite(candidate_scores)]].tolist()
+
+    def _stored_recommendations(self, i, k, exclude_duplicates, mask):
+        """
+        Recommendations for row i from its stored neighbour list, None when
+        fewer than k of them pass the mask and the catalogue must be scored.
+        """
+        candidates = self.neighbors[i]
+        if exclude_duplicates:
+            candidates = candidates[self.titles[candidates] != self.titles[i]]
+        if mask is None:
+            return self.titles[candidates[:k]].tolist()
+        candidates = candidates[mask[candidates]]
+        if len(candidates) >= k:
+            return self.titles[candidates[:k]].tolist()
+        return None
+
+    def recommend_batch(self, titles, k=10, exclude_duplicates=True, mask=None):
+        """
+        Recommendations for many titles, yielded in input order as they are
+        computed.
+
+        Each title gets the same answer as recommend(). Titles served from
+        their stored neighbour list cost a lookup; the rest of a block of
+        titles is scored against the catalogue with one sparse matrix
+        product, the (block x N) slab bounded by BLOCK_BYTES as in
+        neighbor_rows, and top_k selects all their lists at once.
+
+        Args:
+            titles (iterable): Titles to recommend for
+            k (int): Number of titles per list
+            exclude_duplicates (bool): See recommend
+            mask (np.ndarray): Rows allowed, see facet_mask
+
+        Yields:
+            tuple: (title, recommendations), recommendations None for a
+                title not in the catalogue
+        """
+        n = len(self.titles)
+        block_size = max(1, BLOCK_BYTES // (4 * n))
+        matrix_t = title_ids = None
+        titles = iter(titles)
+        while True:
+            block = list(itertools.islice(titles, block_size))
+            if not block:
+                return
+            rows = [self.title_index.get(title) for title in block]
+            results = [
+                None if i is None else self._stored_recommendations(i, k, exclude_duplicates, mask)
+                for i in rows
+            ]
+            pending = [j for j, i in enumerate(rows) if i is not None and results[j] is None]
+            if pending:
+                if matrix_t is None:
+                    matrix_t = self.matrix.T.tocsr()
+                    # equal ids for rows carrying the same title
+                    title_ids = np.unique(self.titles, return_inverse=True)[1]
+                pending_rows = np.array([rows[j] for j in pending])
+                scores = (self.matrix[pending_rows] @ matrix_t).toarray()
+                scores[np.arange(len(pending_rows)), pending_rows] = -np.inf
+                if exclude_duplicates:
+                    scores[title_ids[pending_rows][:, None] == title_ids[None, :]] = -np.inf
+                if mask is not None:
+                    scores[:, ~mask] = -np.inf
+                candidates, candidate_scores = top_k(scores, k)
+                for j, row, row_scores in zip(pending, candidates, candidate_scores):
+                    results[j] = self.titles[row[np.isfinite(row_scores)]].tolist()
+            yield from zip(block, results)
+
+    def recommend_profile(
+        self, liked, disliked=(), k=10, dislike_weight=DISLIKE_WEIGHT, mask=None
+    ):
+        """
+        Return the k titles closest to a profile of several titles.
+
+        The profile is the sum of the liked titles' normalised feature rows
+        minus dislike_weight times the disliked ones, and the whole
+        catalogue is scored against it with one sparse matrix-vector
+        product. The seed titles themselves, and other rows carrying the
+        same titles, are never recommended.
+
+        Args:
+            liked (list): Titles the recommendations should resemble
+            disliked (list): Titles they should not
+            k (int): Number of titles to return
+            dislike_weight (float): Weight of a disliked title's features
+            mask (np.ndarray): Rows allowed, see facet_mask
+
+        Returns:
+            tuple: (titles, unknown) where unknown lists the seed titles
+                not in the catalogue; titles is empty if no liked title is
+        """
+        liked_rows = [self.title_index.get(title) for title in liked]
+        disliked_rows = [self.title_index.get(title) for title in disliked]
+        unknown = [
+            title
+            for title, row in zip([*liked, *disliked], liked_rows + disliked_rows)
+            if row is None
+        ]
+        liked_rows = [row for row in liked_rows if row is not None]
+        disliked_rows = [row for row in disliked_rows if row is not None]
+        if not liked_rows:
+            return [], unknown
+
+        weights = np.zeros(self.matrix.shape[0], dtype=np.float32)
+        np.add.at(weights, liked_rows, 1.0)
+        np.add.at(weights, disliked_rows, -dislike_weight)
+        profile = self.matrix.T @ weights
+        scores = self.matrix @ profile
+
+        seeds = np.array(liked_rows + disliked_rows)
+        scores[np.isin(self.titles, self.titles[seeds])] = -np.inf
+        if mask is not None:
+            scores[~mask] = -np.inf
+        candidates, candidate_scores = top_k(scores, k)
+        return self.titles[candidates[np.isfinite(candidate_scores)]].tolist(), unknown
+
+
+def current_version(path=ARTIFACT_DIR):
+    """Name of the artifact version CURRENT points at, None if there is none"""
+    try:
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def prune_versions(path=ARTIFACT_DIR, keep=KEEP_VERSIONS):
+    """
+    Delete all but the newest `keep` version directories, never the current
+    one. Workers still mapping a deleted version keep reading it until
+    they reload.
+    """
+    current = current_version(path)
+    versions = sorted(
+        name
+        for name in os.listdir(path)
+        if name.startswith("v") and os.path.isdir(os.path.join(path, name))
+    )
+    for name in versions[:-keep]:
+        if name != current:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+
+def batch_records(engine, titles, k=10, mask=None):
+    """
+    JSON lines records for recommend_batch: {"title", "recommendations"},
+    with an "error" message when the title is unknown (plus "suggestions")
+    or the mask leaves nothing to recommend.
+    """
+    for title, recommendations in engine.recommend_batch(titles, k, mask=mask):
+        if recommendations is None:
+            yield {"title": title, "error": NOT_FOUND_MESSAGE, "suggestions": engine.suggest(title)}
+        elif not recommendations and mask is not None:
+            yield {"title": title, "recommendations": [], "error": NO_MATCH_MESSAGE}
+        else:
+            yield {"title": title, "recommendations": recommendations}
+
+
+_engine = None
+_engine_version = None
+_engine_checked_at = 0.0
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """
+    Return the process wide engine.
+
+    The current artifact version is memory mapped when present; otherwise
+    the index is built from the CSV on first use. Every RELOAD_INTERVAL
+    seconds the CURRENT pointer is checked, and a newer version written by
+    `python recommender.py update` is loaded and swapped in; requests
+    already holding the old engine finish with it.
+    """
+    global _engine, _engine_version, _engine_checked_at
+    if _engine is not None and time.monotonic() - _engine_checked_at < RELOAD_INTERVAL:
+        return _engine
+    with _engine_lock:
+        if _engine is not None and time.monotonic() - _engine_checked_at < RELOAD_INTERVAL:
+            return _engine
+        _engine_checked_at = time.monotonic()
+        version = current_version(ARTIFACT_DIR)
+        if version is not None and version != _engine_version:
+            try:
+                _engine = RecommendationEngine.load(ARTIFACT_DIR)
+                _engine_version = version
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not load recommender artifact {version}: {e}")
+        if _engine is None:
+            logger.warning(
+                f"No recommender artifact at {ARTIFACT_DIR}, building from {DATA_PATH}"
+            )
+            _engine = RecommendationEngine.from_csv()
+    return _engine
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Movie recommendation index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="precompute the neighbour artifact")
+    build.add_argument("--data", default=DATA_PATH, help="catalogue csv")
+    build.add_argument("--out", default=ARTIFACT_DIR, help="artifact directory")
+    build.add_argument("-k", type=int, default=NEIGHBORS_K, help="neighbours per title")
+    build.add_argument(
+        "--backend", choices=BACKENDS, default=BACKEND, help="exact or approximate (graph) neighbours"
+    )
+
+    update = commands.add_parser(
+        "update", help="add or replace titles in the artifact without a full rebuild"
+    )
+    update.add_argument(
+        "data",
+        help="csv with movie_title and comb, or actor/director/genres columns as in data.csv",
+    )
+    update.add_argument("--artifact", default=ARTIFACT_DIR, help="artifact directory")
+
+    batch = commands.add_parser(
+        "batch", help="recommendations for many titles, written as JSON lines"
+    )
+    batch.add_argument(
+        "titles",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default="-",
+        help="file with one title per line, - for stdin",
+    )
+    batch.add_argument("-k", type=int, default=10, help="recommendations per title")
+    batch.add_argument(
+        "--out", type=argparse.FileType("w"), default="-", help="output file, - for stdout"
+    )
+    batch.add_argument("--artifact", default=ARTIFACT_DIR, help="artifact directory")
+    batch.add_argument("--genre", dest="genres", action="append", default=[], help="required genre")
+    batch.add_argument(
+        "--director", dest="directors", action="append", default=[], help="allowed director"
+    )
+    batch.add_argument("--actor", dest="actors", action="append", default=[], help="allowed actor")
+    batch.add_argument("--exclude", action="append", default=[], help="title never recommended")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start_time = time.time()
+        engine = RecommendationEngine.from_csv(args.data, args.k, args.backend)
+        engine.save(args.out, source=args.data)
+        print(
+            f"Wrote {len(engine.titles)} titles x {engine.neighbors.shape[1]} neighbours "
+            f"to {args.out} in {time.time() - start_time:.2f} seconds"
+        )
+    elif args.command == "update":
+        start_time = time.time()
+        data = pd.read_csv(args.data)
+        engine = RecommendationEngine.load(args.artifact)
+        updated = engine.update(data)
+        version_path = updated.save(args.artifact, source=args.data)
+        added = len(updated.titles) - len(engine.titles)
+        print(
+            f"Added {added} and replaced {len(data) - added} titles, "
+            f"wrote {version_path} in {time.time() - start_time:.2f} seconds"
+        )
+    elif args.command == "batch":
+        start_time = time.time()
+        try:
+            engine = RecommendationEngine.load(args.artifact)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load recommender artifact, building from {DATA_PATH}: {e}")
+            engine = RecommendationEngine.from_csv()
+        mask = engine.facet_mask(args.genres, args.directors, args.actors, args.exclude)
+        titles = (line.strip() for line in args.titles if line.strip())
+        count = 0
+        for record in batch_records(engine, titles, max(1, args.k), mask):
+            args.out.write(json.dumps(record) + "\n")
+            count += 1
+        args.out.flush()
+        print(
+            f"Wrote recommendations for {count} titles in {time.time() - start_time:.2f} seconds",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
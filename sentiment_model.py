@@ -0,0 +1,143 @@
+import pickle
+import re
+import threading
+import numpy as np
+
+
+MODEL_PATH = "nlp_model.pkl"
+VECTORIZER_PATH = "tranform.pkl"
+
+# URLs and runs of anything but ASCII letters and whitespace, removed in one
+# scan; deleting non-letters never creates a URL, so this matches removing
+# URLs first and the other characters after
+STRIP_PATTERN = re.compile(r"http\S+|[^a-zA-Z\s]+")
+
+
+class SentimentModel:
+    """The review sentiment classifier and its tf-idf vectorizer"""
+
+    def __init__(self, clf, vectorizer):
+        self.clf = clf
+        self.vectorizer = vectorizer
+        # column of predict_proba holding the positive class (label 1)
+        self.positive_column = int(np.flatnonzero(clf.classes_ == 1)[0])
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, vectorizer_path=VECTORIZER_PATH):
+        with open(model_path, "rb") as f:
+            clf = pickle.load(f)
+        with open(vectorizer_path, "rb") as f:
+            vectorizer = pickle.load(f)
+        return cls(clf, vectorizer)
+
+    def score(self, texts):
+        """
+        Classify a batch of texts with one transform and one predict_proba.
+
+        Args:
+            texts (list): Texts to classify
+
+        Returns:
+            tuple: (labels, probabilities) where labels is an int array of
+                1 (positive) / 0 (negative) and probabilities holds the
+                positive class probability of each text
+        """
+        if len(texts) == 0:
+            return np.zeros(0, dtype=int), np.zeros(0)
+        vectors = self.vectorizer.transform(texts)
+        probabilities = self.clf.predict_proba(vectors)[:, self.positive_column]
+        # same decision as clf.predict, a tie goes to the negative class
+        labels = (probabilities > 0.5).astype(int)
+        return labels, probabilities
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_sentiment_model():
+    """Return the process wide sentiment model, or None if it can't be loaded"""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                try:
+                    _model = SentimentModel.load()
+                except Exception as e:
+                    print(f"Error loading sentiment model: {e}")
+                    return None
+    return _model
+
+
+def clean_texts(texts):
+    """
+    Clean a batch of texts for the vectorizer.
+
+    Removes URLs, numbers and special characters and collapses whitespace,
+    with one precompiled substitution per text and str.split for the
+    whitespace (it splits on exactly the characters \\s matches).
+
+    Args:
+        texts (list): Raw texts, None counts as empty
+
+    Returns:
+        list: Cleaned texts in input order
+    """
+    strip = STRIP_PATTERN.sub
+    return [" ".join(strip("", text).split()) if text else "" for text in texts]
+
+
+# positive class probabilities in this band count as neutral
+NEUTRAL_LOW = 0.4
+NEUTRAL_HIGH = 0.6
+
+
+def sentiment_masks(probabilities):
+    """Boolean (positive, neutral, negative) masks over positive class probabilities"""
+    probabilities = np.asarray(probabilities)
+    neutral = (probabilities >= NEUTRAL_LOW) & (probabilities <= NEUTRAL_HIGH)
+    # labels are probability > 0.5, so outside the neutral band the
+    # positives are exactly the texts above it
+    positive = probabilities > NEUTRAL_HIGH
+    negative = ~(neutral | positive)
+    return positive, neutral, negative
+
+
+def summarize_sentiment(texts, probabilities, max_examples):
+    """
+    Bucket scored texts into positive / neutral / negative with array masks.
+
+    Args:
+        texts (list): The original texts, used for the examples
+        probabilities (np.ndarray): Positive class probability of each text
+        max_examples (int): Examples kept per bucket, in input order
+
+    Returns:
+        dict: Counts, the 0-10 sentiment score (neutrals count half) and
+            the examples of each bucket
+    """
+    positive, neutral, negative = sentiment_masks(probabilities)
+
+    positive_count = int(np.count_nonzero(positive))
+    neutral_count = int(np.count_nonzero(neutral))
+    negative_count = int(np.count_nonzero(negative))
+
+    total_count = len(probabilities)
+    sentiment_score = (
+        round(((positive_count + (neutral_count * 0.5)) / total_count) * 10, 1)
+        if total_count > 0
+        else 0
+    )
+
+    def examples(mask):
+        return [texts[i] for i in np.flatnonzero(mask)[:max_examples]]
+
+    return {
+        "positive": positive_count,
+        "neutral": neutral_count,
+        "negative": negative_count,
+        "sentiment_score": sentiment_score,
+        "positive_examples": examples(positive),
+        "neutral_examples": examples(neutral),
+        "negative_examples": examples(negative),
+    }
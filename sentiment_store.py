@@ -0,0 +1,315 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from multiprocessing import Pool
+
+from sentiment_model import get_sentiment_model
+from sqlite_store import SQLiteStore
+from title_index import normalize_title
+
+
+logger = logging.getLogger("sentiment_store")
+
+STORE_PATH = os.environ.get("SENTIMENT_STORE_PATH", "artifacts/sentiment.sqlite3")
+
+# entries older than this are ignored and the movie is scraped live
+MAX_AGE = int(os.environ.get("SENTIMENT_STORE_MAX_AGE", 7 * 24 * 60 * 60))
+
+# review texts kept per movie for display next to the aggregate
+MAX_EXAMPLES = 25
+
+# movies with fewer reviews are not stored: a corpus title matched by one
+# or two reviews is most likely a common phrase ("anything else"), and an
+# entry would be shown as a 0/10 or 10/10 score
+MIN_REVIEWS = int(os.environ.get("SENTIMENT_STORE_MIN_REVIEWS", 5))
+
+# leading articles that reviews commonly leave off a title
+ARTICLES = ("the ", "a ", "an ")
+
+# sequel numbers as reviews and catalogue titles write them
+ROMAN_NUMERALS = {"ii": "2", "iii": "3", "iv": "4", "v": "5", "vi": "6", "vii": "7", "viii": "8"}
+SEQUEL_WORDS = {"part", *ROMAN_NUMERALS, *ROMAN_NUMERALS.values()}
+
+
+def sentiment_score(positive, total):
+    """Share of positive reviews on a 0-10 scale, as shown for IMDB"""
+    return round((positive / total) * 10, 1) if total > 0 else 0
+
+
+class SentimentStore(SQLiteStore):
+    """
+    Per-movie review sentiment aggregates keyed by normalised title.
+
+    Filled in bulk by `python sentiment_store.py build` from a review
+    corpus. /recommend scrapes IMDB live when an entry is missing or older
+    than max_age. Store errors are logged and treated as misses.
+    """
+
+    def __init__(self, path=STORE_PATH, max_age=MAX_AGE):
+        self.max_age = max_age
+        super().__init__(path)
+
+    def create_tables(self, conn):
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS movie_sentiment (
+                title_key TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                positive INTEGER NOT NULL,
+                negative INTEGER NOT NULL,
+                sentiment_score REAL NOT NULL,
+                examples TEXT NOT NULL,
+                source TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+
+    def get_fresh(self, title):
+        """Return the stored entry for a title if it is younger than max_age"""
+        try:
+            with self._lock, self._connection() as conn:
+                row = conn.execute(
+                    """SELECT title, positive, negative, sentiment_score,
+                    examples, source, updated_at
+                    FROM movie_sentiment WHERE title_key = ? AND updated_at >= ?""",
+                    (normalize_title(title), time.time() - self.max_age),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading {self.path}: {e}")
+            return None
+        if row is None:
+            return None
+        columns = (
+            "title",
+            "positive",
+            "negative",
+            "sentiment_score",
+            "examples",
+            "source",
+            "updated_at",
+        )
+        entry = dict(zip(columns, row))
+        entry["examples"] = json.loads(entry["examples"])
+        return entry
+
+    def put_many(self, entries):
+        """
+        Insert or replace aggregates.
+
+        Args:
+            entries (list): dicts with title, positive, negative, examples
+                ([review, "Good"/"Bad"] pairs) and source
+        """
+        now = time.time()
+        rows = [
+            (
+                normalize_title(entry["title"]),
+                entry["title"],
+                entry["positive"],
+                entry["negative"],
+                sentiment_score(entry["positive"], entry["positive"] + entry["negative"]),
+                json.dumps(entry["examples"][:MAX_EXAMPLES]),
+                entry["source"],
+                now,
+            )
+            for entry in entries
+        ]
+        try:
+            with self._lock, self._connection() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO movie_sentiment VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing {self.path}: {e}")
+
+
+def open_sentiment_store(path=STORE_PATH, max_age=MAX_AGE):
+    """Open the store, or return None (live scraping only) if it can't be opened"""
+    try:
+        return SentimentStore(path, max_age)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Sentiment store disabled, could not open {path}: {e}")
+        return None
+
+
+class TitleMatcher:
+    """
+    Finds the catalogue title a review talks about, for corpora such as
+    datasets/reviews.txt that carry no title column.
+
+    Matches the longest run of words in the review equal to a normalised
+    catalogue title of at least two words, also without a leading article
+    ("da vinci code" finds "the da vinci code"). Single word titles are
+    left out, they match ordinary words far too often.
+
+    A trailing sequel number matches in either form ("mission impossible
+    3" finds "mission: impossible iii"). A match followed by a sequel
+    number it doesn't include is dropped rather than credited to the
+    first film, since the review is about a sequel.
+    """
+
+    def __init__(self, titles, max_words=8):
+        self.max_words = max_words
+        self.keys = {}
+        for title in titles:
+            key = normalize_title(title)
+            candidates = [key]
+            for article in ARTICLES:
+                if key.startswith(article):
+                    candidates.append(key[len(article) :])
+            for candidate in list(candidates):
+                head, _, last = candidate.rpartition(" ")
+                if last in ROMAN_NUMERALS:
+                    candidates.append(f"{head} {ROMAN_NUMERALS[last]}")
+            for candidate in candidates:
+                if len(candidate.split()) >= 2:
+                    self.keys.setdefault(candidate, str(title))
+
+    def match(self, text):
+        """
+        Every title the text mentions, longest first, each once; runs of
+        words already matched by a longer title are not matched again.
+        """
+        words = normalize_title(text).split()
+        taken = [False] * len(words)
+        titles = []
+        for n in range(min(self.max_words, len(words)), 1, -1):
+            for i in range(len(words) - n + 1):
+                if any(taken[i : i + n]):
+                    continue
+                title = self.keys.get(" ".join(words[i : i + n]))
+                if title is None:
+                    continue
+                taken[i : i + n] = [True] * n
+                followed_by_sequel = i + n < len(words) and words[i + n] in SEQUEL_WORDS
+                if not followed_by_sequel and title not in titles:
+                    titles.append(title)
+        return titles
+
+
+def read_corpus(path, titles=None):
+    """
+    Yield (title, review) pairs from a tab separated corpus.
+
+    Lines are `title<TAB>review`, or `label<TAB>review` like
+    datasets/reviews.txt, in which case the title is matched from the
+    review text against the catalogue titles passed in, once for every
+    title it mentions. Repeated reviews are read once, the corpus holds
+    some lines dozens of times.
+    """
+    matcher = TitleMatcher(titles) if titles is not None else None
+    seen = set()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            first, _, review = line.rstrip("\n").partition("\t")
+            if not review:
+                continue
+            key = normalize_title(review)
+            if key in seen:
+                continue
+            seen.add(key)
+            for title in matcher.match(review) if matcher else [first]:
+                if title:
+                    yield title, review
+
+
+def score_chunk(chunk):
+    """Worker: classify one chunk of (title, review) pairs"""
+    titles, reviews = zip(*chunk)
+    labels, _ = get_sentiment_model().score(list(reviews))
+    return titles, reviews, labels
+
+
+def chunked(pairs, size):
+    chunk = []
+    for pair in pairs:
+        chunk.append(pair)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_store(
+    pairs, store, workers=None, chunk_size=2000, source="corpus", min_reviews=MIN_REVIEWS
+):
+    """
+    Score (title, review) pairs in chunks across worker processes and
+    write one aggregate per movie with at least min_reviews reviews to
+    the store.
+
+    Returns:
+        tuple: (reviews scored, movies stored)
+    """
+    totals = {}
+    scored = 0
+    with Pool(processes=workers) as pool:
+        for titles, reviews, labels in pool.imap_unordered(
+            score_chunk, chunked(pairs, chunk_size)
+        ):
+            scored += len(labels)
+            for title, review, label in zip(titles, reviews, labels):
+                total = totals.setdefault(
+                    normalize_title(title),
+                    {"title": title, "positive": 0, "negative": 0, "examples": []},
+                )
+                total["positive" if label else "negative"] += 1
+                if len(total["examples"]) < MAX_EXAMPLES:
+                    total["examples"].append([review, "Good" if label else "Bad"])
+
+    totals = [
+        total
+        for total in totals.values()
+        if total["positive"] + total["negative"] >= min_reviews
+    ]
+    store.put_many([{**total, "source": source} for total in totals])
+    return scored, len(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline movie review sentiment store")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="score a review corpus into the store")
+    build.add_argument("--corpus", default="datasets/reviews.txt", help="tab separated reviews")
+    build.add_argument(
+        "--titled",
+        action="store_true",
+        help="lines are title<TAB>review instead of label<TAB>review",
+    )
+    build.add_argument("--out", default=STORE_PATH, help="sqlite store")
+    build.add_argument("--workers", type=int, default=None, help="processes, default all cores")
+    build.add_argument("--chunk-size", type=int, default=2000, help="reviews per batch")
+    build.add_argument(
+        "--min-reviews", type=int, default=MIN_REVIEWS, help="fewest reviews to store a movie"
+    )
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start_time = time.time()
+        titles = None
+        if not args.titled:
+            from recommender import get_engine
+
+            titles = get_engine().titles
+        pairs = read_corpus(args.corpus, titles)
+        scored, movies = build_store(
+            pairs,
+            SentimentStore(args.out),
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            source=os.path.basename(args.corpus),
+            min_reviews=args.min_reviews,
+        )
+        print(
+            f"Scored {scored} reviews into {movies} movies in {args.out} "
+            f"in {time.time() - start_time:.2f} seconds"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,70 @@
+import argparse
 import requests
 import json
-import re
 import numpy as np
 from bs4 import BeautifulSoup
-import pickle
 import os
 import random
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import islice
 
+from cache import TTLCache
+from rate_limit import RateLimit
+from sentiment_model import (
+    clean_texts,
+    get_sentiment_model,
+    sentiment_masks,
+    summarize_sentiment,
+)
+from timeline_store import open_timeline_store
+from title_index import normalize_title
 
-# Load the NLP model and vectorizer
-def load_sentiment_model():
-    try:
-        clf = pickle.load(open("nlp_model.pkl", "rb"))
-        vectorizer = pickle.load(open("tranform.pkl", "rb"))
-        return clf, vectorizer
-    except Exception as e:
-        print(f"Error loading sentiment model: {e}")
-        return None, None
+
+# tweets per page of recent search results, the API allows 10 to 100
+PAGE_SIZE = 100
+
+# tweets scored per model call while ingesting
+BATCH_SIZE = int(os.environ.get("TWITTER_BATCH_SIZE", 100))
 
 
 class TwitterSentiment:
     def __init__(self):
-        self.clf, self.vectorizer = load_sentiment_model()
+        # shared with the rest of the process, loaded once
+        self.model = get_sentiment_model()
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.83 Safari/537.36"
         }
-
-    def clean_text(self, text):
-        """Clean text by removing URLs, special characters, etc."""
-        # Remove URLs
-        text = re.sub(r"http\S+", "", text)
-        # Remove special characters and numbers
-        text = re.sub(r"[^a-zA-Z\s]", "", text)
-        # Remove extra spaces
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        # tweets fetched per request, paged 100 at a time
+        self.max_tweets = int(os.environ.get("TWITTER_MAX_TWEETS", 100))
+        # JSON lines file of recorded tweets to ingest instead of the API
+        self.replay_path = os.environ.get("TWITTER_REPLAY_PATH")
+        # per-day sentiment counters of every tweet ingested
+        self.timeline_store = open_timeline_store()
+
+        # budget of the recent search endpoint; while it is spent, requests
+        # are answered from the cache and refreshed in the background
+        self.rate_limit = RateLimit()
+        self.fresh_ttl = int(os.environ.get("TWITTER_CACHE_TTL", 15 * 60))
+        # entries outlive fresh_ttl so they can be served while rate limited
+        self.results_cache = TTLCache(
+            maxsize=int(os.environ.get("TWITTER_CACHE_SIZE", 256)),
+            ttl=24 * 60 * 60,
+        )
+        self.refresh_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="twitter-refresh"
+        )
+        self.refreshing = set()
+        self.refreshing_lock = threading.Lock()
 
     def analyze_sentiment_with_neutral(self, text_list):
         """Analyze sentiment of a list of texts including neutral category"""
         if not text_list:
             return {"positive": 0, "neutral": 0, "negative": 0, "sentiment_score": 0}
 
-        if self.clf is None or self.vectorizer is None:
+        if self.model is None:
             return {
                 "positive": 0,
                 "neutral": 0,
@@ -53,66 +75,13 @@ class TwitterSentiment:
 
         try:
             # Clean texts
-            cleaned_texts = [self.clean_text(text) for text in text_list]
-
-            # Transform texts
-            text_vectors = self.vectorizer.transform(cleaned_texts)
-
-            # Predict sentiment (binary for now: 1=positive, 0=negative)
-            predictions = self.clf.predict(text_vectors)
-
-            # For prediction probabilities to determine neutrality
-            probabilities = self.clf.predict_proba(text_vectors)
-
-            # Categorize tweets by sentiment
-            positive_examples = []
-            neutral_examples = []
-            negative_examples = []
-
-            positive_count = 0
-            neutral_count = 0
-            negative_count = 0
-
-            # Consider tweets with probability between 0.4 and 0.6 as neutral
-            for i, (text, pred, prob) in enumerate(
-                zip(text_list, predictions, probabilities)
-            ):
-                # Get probability of positive class
-                positive_prob = prob[1] if len(prob) > 1 else prob[0]
-
-                if 0.4 <= positive_prob <= 0.6:
-                    # Neutral sentiment
-                    neutral_count += 1
-                    if len(neutral_examples) < 5:  # Keep up to 5 examples
-                        neutral_examples.append(text)
-                elif pred == 1:
-                    # Positive sentiment
-                    positive_count += 1
-                    if len(positive_examples) < 5:  # Keep up to 5 examples
-                        positive_examples.append(text)
-                else:
-                    # Negative sentiment
-                    negative_count += 1
-                    if len(negative_examples) < 5:  # Keep up to 5 examples
-                        negative_examples.append(text)
-
-            # Calculate sentiment score (0-10 scale) - weighted by neutrals
-            total_count = positive_count + neutral_count + negative_count
-            sentiment_score = (
-                round(((positive_count + (neutral_count * 0.5)) / total_count) * 10, 1)
-                if total_count > 0
-                else 0
-            )
+            cleaned_texts = clean_texts(text_list)
 
-            return {
-                "positive": int(positive_count),
-                "neutral": int(neutral_count),
-                "negative": int(negative_count),
-                "sentiment_score": sentiment_score,
-                "positive_examples": positive_examples,
-                "neutral_examples": neutral_examples,
-                "negative_examples": negative_examples,
-            }
+            # Positive class probability of each text, one pass over the
+            # vectorized batch; neutral / positive / negative are bucketed
+            # with array masks and up to 5 examples kept per bucket
+            _, probabilities = self.model.score(cleaned_texts)
+            return summarize_sentiment(text_list, probabilities, max_examples=5)
 
         except Exception as e:
             print(f"Error in sentiment analysis: {e}")
@@ -184,105 +153,279 @@ class TwitterSentiment:
 
         return sample_tweets
 
-    def get_twitter_content(self, movie_title, limit=30):
+    def stream_tweets(self, movie_title, limit):
         """
-        Fetch tweets about a movie using Twitter API
+        Yield up to `limit` recent tweets about a movie, page by page.
+
+        Pages through the Twitter recent search with next_token, or reads
+        the TWITTER_REPLAY_PATH file instead when it is set. Errors end the
+        stream, keeping the tweets yielded so far. Each tweet id is yielded
+        once: search pages can overlap and replay files repeat tweets, and
+        the timeline counts every id once too.
+
+        Yields:
+            dict: id, text and created_at (datetime or None) of each tweet
         """
+        if self.replay_path:
+            tweets = self.replay_tweets(movie_title)
+        else:
+            tweets = self.search_tweets(movie_title, limit)
+        seen = set()
         try:
-            import tweepy
-            import time
-
-            # Twitter API credentials (using environment variables for security)
-            # You should set these environment variables in your production environment
-            # For development, we'll use the provided values
-            bearer_token = os.environ.get("TWITTER_BEARER_TOKEN")
-            access_token = os.environ.get("TWITTER_ACCESS_TOKEN")
-            access_token_secret = os.environ.get("TWITTER_ACCESS_TOKEN_SECRET")
-
-            # Initialize the Tweepy Client
-            client = tweepy.Client(
-                bearer_token=bearer_token,
-                access_token=access_token,
-                access_token_secret=access_token_secret,
-            )
-
-            # Define search query for the movie
-            query = f"{movie_title} movie"
-            max_results = min(limit, 100)  # Twitter API limits
-
-            tweets = []
-            max_retries = 3
-            retry_count = 0
-
-            while retry_count < max_retries:
-                try:
-                    # Fetch recent tweets containing the query
-                    response = client.search_recent_tweets(
-                        query=query, max_results=max_results
-                    )
-
-                    # Check if any tweets were returned
-                    if response.data:
-                        for tweet in response.data:
-                            tweets.append(tweet.text)
-                        break  # Exit loop if successful
-                    else:
-                        print(f"No tweets found for the query: {query}")
-                        break
-
-                except tweepy.TooManyRequests:
-                    # If rate limit is exceeded, wait before retrying
-                    retry_count += 1
-                    wait_time = 2**retry_count  # Exponential backoff
-                    print(
-                        f"Rate limit exceeded. Waiting {wait_time} seconds before retrying..."
-                    )
-                    time.sleep(wait_time)
-
-                except Exception as e:
-                    print(f"Twitter API error: {e}")
+            for tweet in tweets:
+                if len(seen) >= limit:
                     break
+                if tweet["id"] in seen:
+                    continue
+                seen.add(tweet["id"])
+                yield tweet
+        finally:
+            tweets.close()
+
+    def search_tweets(self, movie_title, limit):
+        """Yield up to `limit` tweets from the Twitter recent search, see stream_tweets"""
+        import tweepy
+
+        # Twitter API credentials (using environment variables for security);
+        # raw responses, so every page's rate limit headers can be read
+        client = tweepy.Client(
+            bearer_token=os.environ.get("TWITTER_BEARER_TOKEN"),
+            access_token=os.environ.get("TWITTER_ACCESS_TOKEN"),
+            access_token_secret=os.environ.get("TWITTER_ACCESS_TOKEN_SECRET"),
+            return_type=requests.Response,
+        )
+
+        # Define search query for the movie
+        query = f"{movie_title} movie"
+        next_token = None
+        fetched = 0
+
+        while fetched < limit:
+            if self.rate_limit.wait_time() > 0:
+                print("Twitter rate limit reached, stopping at", fetched, "tweets")
+                break
+            try:
+                # Fetch the next page of recent tweets containing the query
+                response = client.search_recent_tweets(
+                    query=query,
+                    max_results=min(max(limit - fetched, 10), PAGE_SIZE),
+                    next_token=next_token,
+                    tweet_fields=["created_at"],
+                )
+            except tweepy.TooManyRequests as e:
+                # never wait for the window to reset in a request thread
+                self.rate_limit.exhausted(e.response.headers)
+                print("Twitter rate limit exceeded")
+                break
+            except Exception as e:
+                print(f"Twitter API error: {e}")
+                break
+            self.rate_limit.update(response.headers)
+
+            page = response.json()
+            tweets = page.get("data") or []
+            if not tweets:
+                if fetched == 0:
+                    print(f"No tweets found for the query: {query}")
+                break
+            for tweet in tweets[: limit - fetched]:
+                yield {
+                    "id": tweet["id"],
+                    "text": tweet["text"],
+                    "created_at": parse_created_at(tweet.get("created_at")),
+                }
+            fetched += len(tweets)
+
+            next_token = page.get("meta", {}).get("next_token")
+            if not next_token:
+                break
+
+    def replay_tweets(self, movie_title):
+        """
+        Yield tweets about a movie from a JSON lines replay file, one
+        {"id", "text", "created_at"} object per line (created_at in ISO
+        8601, optional), keeping those whose text mentions the title as
+        whole words ("up" does not match "support").
+        """
+        title_key = f" {normalize_title(movie_title)} "
+        count = 0
+        with open(self.replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                tweet = json.loads(line)
+                if title_key not in f" {normalize_title(tweet['text'])} ":
+                    continue
+                yield {
+                    "id": tweet.get("id", f"replay-{count}"),
+                    "text": tweet["text"],
+                    "created_at": parse_created_at(tweet.get("created_at")),
+                }
+                count += 1
+
+    def ingest_tweets(self, movie_title, tweets, batch_size=BATCH_SIZE):
+        """
+        Score a stream of tweets in micro-batches and count them into the
+        movie's daily timeline as they arrive.
+
+        Args:
+            movie_title (str): Movie the tweets are about
+            tweets (iterable): Tweets as yielded by stream_tweets
+            batch_size (int): Tweets scored per model call
+
+        Returns:
+            dict: Sentiment of all the tweets, as analyze_sentiment_with_neutral,
+                or None if the stream was empty
+        """
+        texts = []
+        probabilities = []
+        tweets = iter(tweets)
+        while True:
+            batch = list(islice(tweets, batch_size))
+            if not batch:
+                break
+            batch_texts = [tweet["text"] for tweet in batch]
+            _, batch_probabilities = self.model.score(clean_texts(batch_texts))
+            texts.extend(batch_texts)
+            probabilities.append(batch_probabilities)
+
+            if self.timeline_store:
+                positive, neutral, _ = sentiment_masks(batch_probabilities)
+                buckets = np.select([positive, neutral], ["positive", "neutral"], "negative")
+                today = date.today().isoformat()
+                self.timeline_store.add(
+                    movie_title,
+                    [
+                        (
+                            tweet["id"],
+                            tweet["created_at"].date().isoformat()
+                            if tweet["created_at"]
+                            else today,
+                            bucket,
+                        )
+                        for tweet, bucket in zip(batch, buckets)
+                    ],
+                )
+
+        if not texts:
+            return None
+        return summarize_sentiment(texts, np.concatenate(probabilities), max_examples=5)
+
+    def sample_twitter_content(self, movie_title, error=None):
+        """Sentiment of generated sample tweets, used when no real ones are available"""
+        print("Using sample Twitter data for", movie_title)
+        tweets = self.get_sample_tweets(movie_title)
+        sentiment_results = self.analyze_sentiment_with_neutral(tweets)
+        sentiment_results["source"] = "Twitter"
+        sentiment_results["content_count"] = len(tweets)
+        sentiment_results["sample"] = True
+        if error:
+            sentiment_results["error"] = error
+        return sentiment_results
+
+    def get_twitter_content(self, movie_title, limit=None):
+        """
+        Fetch tweets about a movie and analyze their sentiment, streaming
+        them through ingest_tweets so the timeline counters stay current.
+        """
+        limit = limit or self.max_tweets
+        try:
+            sentiment_results = None
+            if self.model is not None:
+                sentiment_results = self.ingest_tweets(
+                    movie_title, self.stream_tweets(movie_title, limit)
+                )
 
             # If no tweets found or error occurred, use sample data
-            if not tweets:
-                print("Using sample Twitter data for", movie_title)
-                tweets = self.get_sample_tweets(movie_title)
+            if sentiment_results is None:
+                return self.sample_twitter_content(movie_title)
 
-            # Analyze sentiment with neutral category
-            sentiment_results = self.analyze_sentiment_with_neutral(tweets)
             sentiment_results["source"] = "Twitter"
-            sentiment_results["content_count"] = len(tweets)
-
+            sentiment_results["content_count"] = (
+                sentiment_results["positive"]
+                + sentiment_results["neutral"]
+                + sentiment_results["negative"]
+            )
             return sentiment_results
 
         except ImportError:
             print("Tweepy not installed. Please install with: pip install tweepy")
             # Fallback to sample data
-            tweets = self.get_sample_tweets(movie_title)
-
-            sentiment_results = self.analyze_sentiment_with_neutral(tweets)
-            sentiment_results["source"] = "Twitter"
-            sentiment_results["content_count"] = len(tweets)
-            sentiment_results["error"] = "Tweepy not installed"
-
-            return sentiment_results
+            return self.sample_twitter_content(movie_title, error="Tweepy not installed")
 
         except Exception as e:
             print(f"Error getting Twitter content: {e}")
-            tweets = self.get_sample_tweets(movie_title)
-            sentiment_results = self.analyze_sentiment_with_neutral(tweets)
-            sentiment_results["source"] = "Twitter"
-            sentiment_results["content_count"] = len(tweets)
-            sentiment_results["error"] = str(e)
-            return sentiment_results
+            return self.sample_twitter_content(movie_title, error=str(e))
+
+    def refresh_twitter_content(self, movie_title):
+        """Fetch a movie's Twitter sentiment and cache it unless it is sample data"""
+        sentiment_results = self.get_twitter_content(movie_title)
+        if not sentiment_results.get("sample"):
+            self.results_cache.set(
+                normalize_title(movie_title),
+                {"results": sentiment_results, "fetched_at": time.time()},
+            )
+        return sentiment_results
+
+    def refresh_in_background(self, movie_title):
+        """Refresh a movie once the rate limit resets, at most one pending per movie"""
+        key = normalize_title(movie_title)
+        with self.refreshing_lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+
+        def refresh():
+            try:
+                # waiting here only holds the background thread
+                time.sleep(self.rate_limit.wait_time())
+                self.refresh_twitter_content(movie_title)
+            except Exception as e:
+                print(f"Error refreshing Twitter content: {e}")
+            finally:
+                with self.refreshing_lock:
+                    self.refreshing.discard(key)
+
+        self.refresh_executor.submit(refresh)
+
+    def cached_twitter_content(self, movie_title):
+        """
+        Twitter sentiment of a movie without ever waiting on the rate limit.
+
+        Fresh cached results are returned as is. While the search budget is
+        spent, the last known results (or sample data if there are none)
+        are returned immediately and a refresh is queued for when the
+        window resets; otherwise the tweets are fetched now.
+        """
+        entry = self.results_cache.get(normalize_title(movie_title))
+        if entry is not None and time.time() - entry["fetched_at"] < self.fresh_ttl:
+            return entry["results"]
+
+        if self.rate_limit.wait_time() > 0:
+            self.refresh_in_background(movie_title)
+            if entry is not None:
+                return entry["results"]
+            return self.sample_twitter_content(
+                movie_title, error="Twitter rate limit reached, showing sample tweets"
+            )
+
+        sentiment_results = self.refresh_twitter_content(movie_title)
+        if sentiment_results.get("sample"):
+            # rate limited (or failed) during the fetch itself
+            if self.rate_limit.wait_time() > 0:
+                self.refresh_in_background(movie_title)
+            if entry is not None:
+                return entry["results"]
+        return sentiment_results
 
     def get_movie_sentiment(self, movie_title):
         """Get Twitter sentiment for a movie"""
-        twitter_results = self.get_twitter_content(movie_title)
+        # copied, cached results are shared between requests
+        twitter_results = dict(self.cached_twitter_content(movie_title))
 
-        # Generate timeline data (sample data for now)
-        timeline_data = self.generate_sample_timeline_data()
-        twitter_results["timeline"] = timeline_data
+        # Timeline from the per-day counters of the tweets ingested so far
+        if self.timeline_store:
+            twitter_results["timeline"] = self.timeline_store.timeline(movie_title)
 
         return {
             "twitter": twitter_results,
@@ -294,33 +437,46 @@ class TwitterSentiment:
             },
         }
 
-    def generate_sample_timeline_data(self):
-        """Generate sample timeline data for sentiment over time"""
-        today = datetime.now()
-        dates = [
-            (today - timedelta(days=i)).strftime("%b %d") for i in range(6, -1, -1)
-        ]
-
-        # Generate random sentiment data
-        positive_values = [random.randint(40, 70) for _ in range(7)]
-        neutral_values = [random.randint(10, 30) for _ in range(7)]
-        negative_values = []
-
-        # Calculate negative to make total 100%
-        for i in range(7):
-            remaining = 100 - positive_values[i] - neutral_values[i]
-            negative_values.append(max(0, remaining))  # Ensure non-negative
 
-        return {
-            "dates": dates,
-            "positive": positive_values,
-            "neutral": neutral_values,
-            "negative": negative_values,
-        }
+def parse_created_at(created_at):
+    """Tweet creation time from its ISO 8601 string, None if missing"""
+    if not created_at:
+        return None
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Twitter movie sentiment")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser(
+        "ingest", help="stream tweets about movies into the sentiment timeline"
+    )
+    ingest.add_argument("titles", nargs="+", help="movie titles")
+    ingest.add_argument("--replay", help="JSON lines file of tweets instead of the API")
+    ingest.add_argument("--limit", type=int, default=1000, help="tweets per movie")
+
+    show = commands.add_parser("show", help="print the sentiment of a movie")
+    show.add_argument("title")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        if args.replay:
+            os.environ["TWITTER_REPLAY_PATH"] = args.replay
+        analyzer = TwitterSentiment()
+        for title in args.titles:
+            # fetched directly, not through the results cache, so every
+            # run ingests up to --limit tweets
+            twitter = analyzer.get_twitter_content(title, args.limit)
+            if twitter.get("sample"):
+                print(f"{title}: no tweets ingested, error {twitter.get('error')}")
+                continue
+            print(f"{title}: {twitter['content_count']} tweets, score {twitter['sentiment_score']}")
+            if analyzer.timeline_store:
+                print(json.dumps(analyzer.timeline_store.timeline(title), indent=2))
+    elif args.command == "show":
+        print(json.dumps(TwitterSentiment().get_movie_sentiment(args.title), indent=2))
 
 
-# Example usage
 if __name__ == "__main__":
-    analyzer = TwitterSentiment()
-    results = analyzer.get_movie_sentiment("Inception")
-    print(json.dumps(results, indent=2))
+    main()
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Base for the small SQLite backed stores shared by gunicorn workers.
+
+    Subclasses create their tables in create_tables(). Access goes through
+    _connection() while holding _lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock, self._connection() as conn:
+            self.create_tables(conn)
+
+    def create_tables(self, conn):
+        raise NotImplementedError
+
+    def _connection(self):
+        """
+        Return this process's connection, caller holds the lock.
+
+        SQLite connections must not cross a fork, so a gunicorn worker
+        forked from a --preload master opens its own; the timeout covers
+        other workers writing to the same file.
+        """
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._pid = os.getpid()
+        return self._conn
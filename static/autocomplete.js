@@ -1,11 +1,16 @@
 new autoComplete({
     data: {                              // Data src [Array, Function, Async] | (REQUIRED)
-      src: films,
+      src: async () => {
+        const query = document.querySelector("#autoComplete").value;
+        const source = await fetch("/search?limit=5&q=" + encodeURIComponent(query));
+        return await source.json();
+      },
+      cache: false
     },
     selector: "#autoComplete",           // Input field selector              | (Optional)
     threshold: 2,                        // Min. Chars length to start Engine | (Optional)
     debounce: 100,                       // Post duration for engine to start | (Optional)
-    searchEngine: "strict",              // Search Engine type/mode           | (Optional)
+    searchEngine: (query, record) => record, // Matching is done by /search   | (Optional)
     resultsList: {                       // Rendered results list object      | (Optional)
         render: true,
         container: source => {
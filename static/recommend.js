@@ -17,7 +17,7 @@ $(function() {
     var title = $('.movie').val();
     if (title=="") {
       $('.results').css('display','none');
-      $('.fail').css('display','block');
+      show_fail();
     }
     else{
       load_details(my_api_key,title);
@@ -25,6 +25,16 @@ $(function() {
   });
 });
 
+// shows the failure message, or the page's default one when none is given
+function show_fail(message){
+  var heading = $('.fail h3');
+  if(heading.data('default')===undefined){
+    heading.data('default', heading.text());
+  }
+  heading.text(message || heading.data('default'));
+  $('.fail').css('display','block');
+}
+
 // will be invoked when clicking on the recommended movies
 function recommendcard(e){
   var my_api_key = 'enter_your_tmdb_api_key';
@@ -40,7 +50,7 @@ function load_details(my_api_key,title){
 
     success: function(movie){
       if(movie.results.length<1){
-        $('.fail').css('display','block');
+        show_fail();
         $('.results').css('display','none');
         $("#loader").delay(500).fadeOut();
       }
@@ -67,8 +77,8 @@ function movie_recs(movie_title,movie_id,my_api_key){
     url:"/similarity",
     data:{'name':movie_title},
     success: function(recs){
-      if(recs=="Sorry! The movie you requested is not in our database. Please check the spelling or try with some other movies"){
-        $('.fail').css('display','block');
+      if(recs.startsWith("Sorry!")){
+        show_fail(recs);
         $('.results').css('display','none');
         $("#loader").delay(500).fadeOut();
       }
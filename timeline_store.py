@@ -0,0 +1,137 @@
+import logging
+import os
+import sqlite3
+from datetime import date, timedelta
+
+from sqlite_store import SQLiteStore
+from title_index import normalize_title
+
+
+logger = logging.getLogger("timeline_store")
+
+STORE_PATH = os.environ.get("TWITTER_TIMELINE_PATH", "artifacts/twitter.sqlite3")
+
+# days of counters and seen tweet ids kept per movie
+RETENTION_DAYS = int(os.environ.get("TWITTER_TIMELINE_DAYS", 30))
+
+BUCKETS = ("positive", "neutral", "negative")
+
+
+class TimelineStore(SQLiteStore):
+    """
+    Per-movie, per-day counts of positive / neutral / negative tweets.
+
+    Tweets are added as they are ingested and counted once per movie by
+    tweet id, so overlapping searches and replays don't double count.
+    Reading a timeline is a single indexed range query over at most
+    `days` rows. Store errors are logged and treated as empty timelines.
+    """
+
+    def __init__(self, path=STORE_PATH, retention_days=RETENTION_DAYS):
+        self.retention_days = retention_days
+        super().__init__(path)
+
+    def create_tables(self, conn):
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS tweet_sentiment_daily (
+                title_key TEXT NOT NULL,
+                day TEXT NOT NULL,
+                positive INTEGER NOT NULL DEFAULT 0,
+                neutral INTEGER NOT NULL DEFAULT 0,
+                negative INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (title_key, day)
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS seen_tweets (
+                title_key TEXT NOT NULL,
+                tweet_id TEXT NOT NULL,
+                day TEXT NOT NULL,
+                PRIMARY KEY (title_key, tweet_id)
+            )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS seen_tweets_day ON seen_tweets (day)")
+
+    def add(self, title, tweets):
+        """
+        Count a micro-batch of scored tweets.
+
+        Args:
+            title (str): Movie title
+            tweets (list): (tweet_id, day, bucket) tuples, day an ISO date
+                string and bucket one of BUCKETS
+
+        Returns:
+            int: Tweets counted, i.e. not seen before for this movie
+        """
+        title_key = normalize_title(title)
+        counts = {}
+        try:
+            with self._lock, self._connection() as conn:
+                for tweet_id, day, bucket in tweets:
+                    inserted = conn.execute(
+                        "INSERT OR IGNORE INTO seen_tweets VALUES (?, ?, ?)",
+                        (title_key, str(tweet_id), day),
+                    ).rowcount
+                    if inserted:
+                        day_counts = counts.setdefault(day, dict.fromkeys(BUCKETS, 0))
+                        day_counts[bucket] += 1
+                conn.executemany(
+                    """INSERT INTO tweet_sentiment_daily VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (title_key, day) DO UPDATE SET
+                        positive = positive + excluded.positive,
+                        neutral = neutral + excluded.neutral,
+                        negative = negative + excluded.negative""",
+                    [
+                        (title_key, day, *(day_counts[bucket] for bucket in BUCKETS))
+                        for day, day_counts in counts.items()
+                    ],
+                )
+                cutoff = (date.today() - timedelta(days=self.retention_days)).isoformat()
+                conn.execute("DELETE FROM seen_tweets WHERE day < ?", (cutoff,))
+                conn.execute("DELETE FROM tweet_sentiment_daily WHERE day < ?", (cutoff,))
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing {self.path}: {e}")
+            return 0
+        return sum(sum(day_counts.values()) for day_counts in counts.values())
+
+    def timeline(self, title, days=7):
+        """
+        Sentiment of a movie's tweets over the last `days` days.
+
+        Returns:
+            dict: dates ("Jan 01") and the positive / neutral / negative
+                share of each day's tweets in percent, 0 on days without any
+        """
+        today = date.today()
+        first_day = today - timedelta(days=days - 1)
+        rows = []
+        try:
+            with self._lock, self._connection() as conn:
+                rows = conn.execute(
+                    """SELECT day, positive, neutral, negative FROM tweet_sentiment_daily
+                    WHERE title_key = ? AND day >= ?""",
+                    (normalize_title(title), first_day.isoformat()),
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading {self.path}: {e}")
+        counts = {row[0]: row[1:] for row in rows}
+
+        timeline = {"dates": [], **{bucket: [] for bucket in BUCKETS}}
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            day_counts = counts.get(day.isoformat(), (0, 0, 0))
+            total = sum(day_counts)
+            timeline["dates"].append(day.strftime("%b %d"))
+            for bucket, count in zip(BUCKETS, day_counts):
+                timeline[bucket].append(round(count / total * 100) if total else 0)
+        return timeline
+
+
+def open_timeline_store(path=STORE_PATH, retention_days=RETENTION_DAYS):
+    """Open the store, or return None (no timeline) if it can't be opened"""
+    try:
+        return TimelineStore(path, retention_days)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Twitter timeline disabled, could not open {path}: {e}")
+        return None
@@ -0,0 +1,116 @@
+import bisect
+import re
+import unicodedata
+import numpy as np
+
+
+_APOSTROPHES = re.compile(r"['`’]")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(title):
+    """
+    Normalise a title for lookups.
+
+    Case folds, strips accents and apostrophes, turns the remaining
+    punctuation into spaces and collapses whitespace (including the
+    trailing non-breaking spaces found in main_data.csv), so
+    "Spider-Man 2\xa0 " and "spider man 2" map to the same key.
+    """
+    title = unicodedata.normalize("NFKD", str(title))
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    title = _APOSTROPHES.sub("", title.casefold())
+    title = _PUNCTUATION.sub(" ", title)
+    return _WHITESPACE.sub(" ", title).strip()
+
+
+def trigrams(text):
+    """Character trigrams of an already normalised string, padded at the edges"""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """
+    Hash index from normalised title to catalogue row, with a trigram index
+    for suggesting the closest titles when there is no exact match.
+    """
+
+    def __init__(self, titles):
+        self.keys = []
+        self.rows = []
+        self.lookup = {}
+        # every row of titles found on several rows, first row first
+        self.duplicates = {}
+        postings = {}
+        for row, title in enumerate(titles):
+            key = normalize_title(title)
+            # first row wins for duplicated titles
+            if key in self.lookup:
+                self.duplicates.setdefault(key, [self.lookup[key]]).append(row)
+                continue
+            key_id = len(self.keys)
+            self.lookup[key] = row
+            self.keys.append(key)
+            self.rows.append(row)
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(key_id)
+
+        self.rows = np.array(self.rows, dtype=np.int32)
+        self.postings = {
+            gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self.gram_counts = np.array(
+            [len(trigrams(key)) for key in self.keys], dtype=np.float32
+        )
+
+        # keys in sorted order for prefix range scans
+        order = sorted(range(len(self.keys)), key=self.keys.__getitem__)
+        self.sorted_keys = [self.keys[i] for i in order]
+        self.sorted_rows = self.rows[order]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, title):
+        """Return the row id of an exact (normalised) match, or None"""
+        return self.lookup.get(normalize_title(title))
+
+    def get_all(self, title):
+        """Return the row ids of every row with the (normalised) title, [] if none"""
+        key = normalize_title(title)
+        if key not in self.lookup:
+            return []
+        return self.duplicates.get(key, [self.lookup[key]])
+
+    def fuzzy(self, title, n=5):
+        """
+        Return up to n (row id, score) pairs for the closest titles.
+
+        The score is the Dice coefficient of the character trigram sets, from
+        0 (nothing shared) to 1 (identical), best match first.
+        """
+        grams = trigrams(normalize_title(title))
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits or n <= 0:
+            return []
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.keys))
+        scores = 2 * shared / (len(grams) + self.gram_counts)
+        n = min(n, len(scores))
+        top = np.argpartition(scores, len(scores) - n)[len(scores) - n :]
+        top = top[np.lexsort((top, -scores[top]))]
+        return [
+            (int(self.rows[i]), float(scores[i])) for i in top if scores[i] > 0
+        ]
+
+    def prefix(self, query, n=5):
+        """Return the row ids of up to n titles starting with query, alphabetically"""
+        query = normalize_title(query)
+        if not query or n <= 0:
+            return []
+        start = bisect.bisect_left(self.sorted_keys, query)
+        # every key starting with query sorts before query + U+10FFFF
+        stop = bisect.bisect_left(self.sorted_keys, query + "\U0010ffff", start)
+        return self.sorted_rows[start : min(stop, start + n)].tolist()
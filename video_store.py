@@ -0,0 +1,111 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from sqlite_store import SQLiteStore
+
+
+logger = logging.getLogger("video_store")
+
+STORE_PATH = os.environ.get("YOUTUBE_STORE_PATH", "artifacts/youtube.sqlite3")
+MAX_ENTRIES = int(os.environ.get("YOUTUBE_STORE_MAX_ENTRIES", 5000))
+
+
+class VideoStore(SQLiteStore):
+    """
+    On-disk SQLite store of YouTube transcripts and their analyses.
+
+    A video's transcript never changes, and neither does its analysis for
+    a given prompt and model, so both are kept across requests and
+    restarts. Analyses are keyed by (video id, version) where the version
+    hashes the prompt and model settings, so changing either just misses.
+    Each table keeps at most max_entries rows, evicting the least recently
+    used ones. Store errors are logged and treated as misses.
+    """
+
+    def __init__(self, path=STORE_PATH, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        super().__init__(path)
+
+    def create_tables(self, conn):
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS transcripts (
+                video_id TEXT PRIMARY KEY,
+                transcript TEXT NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS analyses (
+                video_id TEXT NOT NULL,
+                version TEXT NOT NULL,
+                analysis TEXT NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (video_id, version)
+            )"""
+        )
+        for table in ("transcripts", "analyses"):
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+            )
+
+    def _get(self, table, value_column, where, params):
+        try:
+            with self._lock, self._connection() as conn:
+                row = conn.execute(
+                    f"SELECT {value_column} FROM {table} WHERE {where}", params
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        f"UPDATE {table} SET accessed_at = ? WHERE {where}",
+                        (time.time(), *params),
+                    )
+            return None if row is None else row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"Error reading {table} from {self.path}: {e}")
+            return None
+
+    def _put(self, table, values):
+        placeholders = ", ".join("?" * (len(values) + 1))
+        try:
+            with self._lock, self._connection() as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})",
+                    (*values, time.time()),
+                )
+                # evict the least recently used rows beyond max_entries
+                conn.execute(
+                    f"""DELETE FROM {table} WHERE rowid IN (
+                        SELECT rowid FROM {table} ORDER BY accessed_at DESC
+                        LIMIT -1 OFFSET ?
+                    )""",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Error writing {table} to {self.path}: {e}")
+
+    def get_transcript(self, video_id):
+        return self._get("transcripts", "transcript", "video_id = ?", (video_id,))
+
+    def put_transcript(self, video_id, transcript):
+        self._put("transcripts", (video_id, transcript))
+
+    def get_analysis(self, video_id, version):
+        analysis = self._get(
+            "analyses", "analysis", "video_id = ? AND version = ?", (video_id, version)
+        )
+        return None if analysis is None else json.loads(analysis)
+
+    def put_analysis(self, video_id, version, analysis):
+        self._put("analyses", (video_id, version, json.dumps(analysis)))
+
+
+def open_video_store(path=STORE_PATH, max_entries=MAX_ENTRIES):
+    """Open the store, or return None (no caching) if it can't be opened"""
+    try:
+        return VideoStore(path, max_entries)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"YouTube store disabled, could not open {path}: {e}")
+        return None
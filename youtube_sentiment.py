@@ -1,8 +1,8 @@
 import requests
+import hashlib
 import json
 import re
 import numpy as np
-import pickle
 import os
 import random
 from datetime import datetime, timedelta
@@ -10,9 +10,16 @@ from googleapiclient.discovery import build
 from youtube_transcript_api import YouTubeTranscriptApi
 from openai import OpenAI
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
+from cache import TTLCache
+from sentiment_model import clean_texts, get_sentiment_model, summarize_sentiment
+from title_index import normalize_title
+from video_store import open_video_store
+
 # Load environment variables from .env file if present
 load_dotenv()
 
@@ -24,21 +31,47 @@ logging.basicConfig(
 logger = logging.getLogger("youtube_sentiment")
 
 
-# Load the NLP model and vectorizer
-def load_sentiment_model():
-    try:
-        clf = pickle.load(open("nlp_model.pkl", "rb"))
-        vectorizer = pickle.load(open("tranform.pkl", "rb"))
-        return clf, vectorizer
-    except Exception as e:
-        print(f"Error loading sentiment model: {e}")
-        return None, None
+# Settings of the OpenAI review analysis. ANALYSIS_VERSION hashes them, so
+# stored analyses are only reused while the prompt and model are unchanged.
+OPENAI_MODEL = "gpt-3.5-turbo"
+OPENAI_SYSTEM_PROMPT = "You are a helpful assistant that analyzes movie reviews."
+OPENAI_PROMPT = """
+            The following is a transcript from a YouTube review of the movie "{movie_name}".
+            Please analyze this review and provide:
+            1. A brief summary (2-3 sentences)
+            2. The overall sentiment (positive, negative, or neutral)
+            3. A sentiment score from -1.0 (very negative) to 1.0 (very positive)
+            
+            Transcript:
+            {transcript}
+            """
+OPENAI_MAX_TOKENS = 300
+OPENAI_TEMPERATURE = 0.3
+TRANSCRIPT_CHARS = 4000
+ANALYSIS_VERSION = hashlib.sha1(
+    json.dumps(
+        [
+            OPENAI_MODEL,
+            OPENAI_SYSTEM_PROMPT,
+            OPENAI_PROMPT,
+            OPENAI_MAX_TOKENS,
+            OPENAI_TEMPERATURE,
+            TRANSCRIPT_CHARS,
+        ]
+    ).encode()
+).hexdigest()[:16]
 
 
 class YouTubeSentiment:
     # Then in your class initialization
-    def __init__(self):
-        self.clf, self.vectorizer = load_sentiment_model()
+    def __init__(self, lookups=8):
+        """
+        Args:
+            lookups (int): Movies that may be looked up at once, e.g. the
+                size of the caller's pool; sizes the video pool
+        """
+        # shared with the rest of the process, loaded once
+        self.model = get_sentiment_model()
 
         # Get API keys from environment with fallbacks for development
         self.youtube_api_key = os.environ.get("YOUTUBE_API_KEY", "")
@@ -51,23 +84,40 @@ class YouTubeSentiment:
         if not self.openai_api_key:
             logger.warning("OpenAI API key not found in environment variables")
 
-        # Initialize OpenAI client if key is available
+        # Initialize OpenAI client if key is available; it is thread safe and
+        # pools its HTTP connections, so every analysis reuses this one
         if self.openai_api_key:
             self.openai_client = OpenAI(api_key=self.openai_api_key)
         else:
             self.openai_client = None
 
-    def clean_text(self, text):
-        """Clean text by removing URLs, special characters, etc."""
-        if not text:
-            return ""
-        # Remove URLs
-        text = re.sub(r"http\S+", "", text)
-        # Remove special characters and numbers
-        text = re.sub(r"[^a-zA-Z\s]", "", text)
-        # Remove extra spaces
-        text = re.sub(r"\s+", " ", text).strip()
-        return text
+        # YouTube Data API clients, one per thread, see youtube_client()
+        self.youtube_clients = threading.local()
+
+        # Videos analysed per movie, and the overall time budget in seconds
+        # for fetching their transcripts and analyses in parallel
+        self.max_results = int(os.environ.get("YOUTUBE_MAX_RESULTS", 3))
+        self.deadline = float(os.environ.get("YOUTUBE_DEADLINE", 20))
+        # a thread for every video of every concurrent lookup: videos that
+        # miss the deadline keep their thread until they finish, and later
+        # lookups must not queue behind them past their own deadline
+        self.video_executor = ThreadPoolExecutor(
+            max_workers=int(os.environ.get("YOUTUBE_WORKERS", lookups * self.max_results)),
+            thread_name_prefix="youtube",
+        )
+
+        # Transcripts and analyses kept on disk by video id
+        self.store = open_video_store()
+
+        # Finished results per movie, shared by the page render and the
+        # /youtube_reviews call the page makes for the same title
+        self.results_cache = TTLCache(
+            maxsize=int(os.environ.get("YOUTUBE_CACHE_SIZE", 256)),
+            ttl=int(os.environ.get("YOUTUBE_CACHE_TTL", 6 * 60 * 60)),
+        )
+        # results holding sample reviews or failed analyses, kept briefly
+        # so a failing API is not retried by every request
+        self.fallback_ttl = int(os.environ.get("YOUTUBE_FALLBACK_TTL", 5 * 60))
 
     def analyze_sentiment_with_model(self, text_list):
         """
@@ -77,7 +127,7 @@ class YouTubeSentiment:
         if not text_list:
             return {"positive": 0, "neutral": 0, "negative": 0, "sentiment_score": 0}
 
-        if self.clf is None or self.vectorizer is None:
+        if self.model is None:
             return {
                 "positive": 0,
                 "neutral": 0,
@@ -88,66 +138,13 @@ class YouTubeSentiment:
 
         try:
             # Clean texts
-            cleaned_texts = [self.clean_text(text) for text in text_list]
-
-            # Transform texts
-            text_vectors = self.vectorizer.transform(cleaned_texts)
-
-            # Predict sentiment (binary for now: 1=positive, 0=negative)
-            predictions = self.clf.predict(text_vectors)
-
-            # For prediction probabilities to determine neutrality
-            probabilities = self.clf.predict_proba(text_vectors)
-
-            # Categorize content by sentiment
-            positive_examples = []
-            neutral_examples = []
-            negative_examples = []
-
-            positive_count = 0
-            neutral_count = 0
-            negative_count = 0
-
-            # Consider content with probability between 0.4 and 0.6 as neutral
-            for i, (text, pred, prob) in enumerate(
-                zip(text_list, predictions, probabilities)
-            ):
-                # Get probability of positive class
-                positive_prob = prob[1] if len(prob) > 1 else prob[0]
-
-                if 0.4 <= positive_prob <= 0.6:
-                    # Neutral sentiment
-                    neutral_count += 1
-                    if len(neutral_examples) < 3:  # Keep up to 3 examples
-                        neutral_examples.append(text)
-                elif pred == 1:
-                    # Positive sentiment
-                    positive_count += 1
-                    if len(positive_examples) < 3:  # Keep up to 3 examples
-                        positive_examples.append(text)
-                else:
-                    # Negative sentiment
-                    negative_count += 1
-                    if len(negative_examples) < 3:  # Keep up to 3 examples
-                        negative_examples.append(text)
-
-            # Calculate sentiment score (0-10 scale) - weighted by neutrals
-            total_count = positive_count + neutral_count + negative_count
-            sentiment_score = (
-                round(((positive_count + (neutral_count * 0.5)) / total_count) * 10, 1)
-                if total_count > 0
-                else 0
-            )
+            cleaned_texts = clean_texts(text_list)
 
-            return {
-                "positive": int(positive_count),
-                "neutral": int(neutral_count),
-                "negative": int(negative_count),
-                "sentiment_score": sentiment_score,
-                "positive_examples": positive_examples,
-                "neutral_examples": neutral_examples,
-                "negative_examples": negative_examples,
-            }
+            # Positive class probability of each text, one pass over the
+            # vectorized batch; neutral / positive / negative are bucketed
+            # with array masks and up to 3 examples kept per bucket
+            _, probabilities = self.model.score(cleaned_texts)
+            return summarize_sentiment(text_list, probabilities, max_examples=3)
 
         except Exception as e:
             print(f"Error in sentiment analysis: {e}")
@@ -162,53 +159,51 @@ class YouTubeSentiment:
                 "negative_examples": [],
             }
 
-    def analyze_with_openai(self, transcript_text, movie_name):
+    def analyze_with_openai(self, transcript_text, movie_name, video_id=None):
         """
         Analyze the sentiment of a transcript using OpenAI API.
 
         Args:
             transcript_text (str): The transcript text to analyze
             movie_name (str): Name of the movie for context
+            video_id (str): YouTube video ID; when given, a stored analysis
+                for the current ANALYSIS_VERSION is reused and a new one stored
 
         Returns:
             dict: Sentiment analysis results
         """
-        try:
-            # Import OpenAI client properly
-            from openai import OpenAI
+        if video_id and self.store:
+            analysis = self.store.get_analysis(video_id, ANALYSIS_VERSION)
+            if analysis is not None:
+                return analysis
 
-            # Initialize the client
-            client = OpenAI(api_key=self.openai_api_key)
+        try:
+            client = self.openai_client
+            if client is None:
+                raise ValueError("OpenAI API key not configured")
 
             # Limit text to avoid token limits
             trimmed_text = (
-                transcript_text[:4000] if transcript_text else "No transcript available"
+                transcript_text[:TRANSCRIPT_CHARS]
+                if transcript_text
+                else "No transcript available"
             )
 
             # Prepare prompt for OpenAI
-            prompt = f"""
-            The following is a transcript from a YouTube review of the movie "{movie_name}".
-            Please analyze this review and provide:
-            1. A brief summary (2-3 sentences)
-            2. The overall sentiment (positive, negative, or neutral)
-            3. A sentiment score from -1.0 (very negative) to 1.0 (very positive)
-            
-            Transcript:
-            {trimmed_text}
-            """
+            prompt = OPENAI_PROMPT.format(movie_name=movie_name, transcript=trimmed_text)
 
             # Call OpenAI API with current format
             response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=OPENAI_MODEL,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a helpful assistant that analyzes movie reviews.",
+                        "content": OPENAI_SYSTEM_PROMPT,
                     },
                     {"role": "user", "content": prompt},
                 ],
-                max_tokens=300,
-                temperature=0.3,
+                max_tokens=OPENAI_MAX_TOKENS,
+                temperature=OPENAI_TEMPERATURE,
             )
 
             # Process the response (updated for new response format)
@@ -247,15 +242,43 @@ class YouTubeSentiment:
             elif "negative" in sentiment.lower():
                 sentiment_category = "negative"
 
-            return {"summary": summary, "sentiment": sentiment_category, "score": score}
+            analysis = {
+                "summary": summary,
+                "sentiment": sentiment_category,
+                "score": score,
+            }
+            if video_id and self.store:
+                self.store.put_analysis(video_id, ANALYSIS_VERSION, analysis)
+            return analysis
         except Exception as e:
             print(f"Error analyzing sentiment with OpenAI: {e}")
             return {
                 "summary": "Error analyzing review content",
                 "sentiment": "neutral",
                 "score": 0,
+                "failed": True,
             }
 
+    def youtube_client(self):
+        """
+        Return this thread's YouTube Data API client, building it on first use.
+
+        build() loads and parses the discovery document, so it runs once per
+        thread instead of once per search. Clients are per thread because
+        the httplib2 transport underneath is not thread safe; each keeps its
+        own keep-alive connection. YOUTUBE_DISCOVERY_URL points the client
+        at another discovery document, e.g. a local stub.
+        """
+        client = getattr(self.youtube_clients, "client", None)
+        if client is None:
+            options = {}
+            discovery_url = os.environ.get("YOUTUBE_DISCOVERY_URL")
+            if discovery_url:
+                options = {"discoveryServiceUrl": discovery_url, "static_discovery": False}
+            client = build("youtube", "v3", developerKey=self.youtube_api_key, **options)
+            self.youtube_clients.client = client
+        return client
+
     def search_youtube_reviews(self, movie_name, max_results=3):
         """
         Search YouTube for movie reviews based on movie name.
@@ -268,8 +291,7 @@ class YouTubeSentiment:
             list: List of dictionaries containing video information
         """
         try:
-            # Initialize YouTube API client
-            youtube = build("youtube", "v3", developerKey=self.youtube_api_key)
+            youtube = self.youtube_client()
 
             # Construct search query
             search_query = f"{movie_name} movie review"
@@ -307,7 +329,8 @@ class YouTubeSentiment:
 
     def get_video_transcript(self, video_id):
         """
-        Get transcript of a YouTube video using the YouTube Transcript API.
+        Get transcript of a YouTube video using the YouTube Transcript API,
+        or from the on-disk store if it was fetched before.
 
         Args:
             video_id (str): YouTube video ID
@@ -315,9 +338,16 @@ class YouTubeSentiment:
         Returns:
             str: Full transcript text
         """
+        if self.store:
+            transcript_text = self.store.get_transcript(video_id)
+            if transcript_text is not None:
+                return transcript_text
+
         try:
             transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
             transcript_text = " ".join([item["text"] for item in transcript_list])
+            if transcript_text and self.store:
+                self.store.put_transcript(video_id, transcript_text)
             return transcript_text
         except Exception as e:
             print(f"Error getting transcript for video {video_id}: {e}")
@@ -356,28 +386,66 @@ class YouTubeSentiment:
                 "score": -0.7,
             },
         ]
+        for sample in samples:
+            sample["sample"] = True
 
         return samples
 
-    def process_youtube_reviews(self, movie_name):
+    def process_video(self, video, movie_name):
+        """
+        Fetch the transcript of one video and analyse it.
+
+        Returns:
+            dict: Video info combined with the analysis, or None if the
+                video has no transcript
+        """
+        # Get transcript
+        transcript = self.get_video_transcript(video["video_id"])
+
+        if not transcript:
+            logger.warning(f"No transcript available for video: {video['video_id']}")
+            return None
+
+        logger.info(
+            f"Got transcript for video: {video['video_id']} (length: {len(transcript)} chars)"
+        )
+
+        # Analyze sentiment
+        analysis = self.analyze_with_openai(transcript, movie_name, video["video_id"])
+        logger.info(
+            f"Sentiment analysis complete: {analysis['sentiment']} (score: {analysis['score']})"
+        )
+
+        # Combine video info with analysis
+        return {**video, **analysis}
+
+    def process_youtube_reviews(self, movie_name, max_results=None, deadline=None):
         """
         Main function to process YouTube reviews for a movie.
 
+        Videos are processed in parallel on a bounded thread pool. Whatever
+        has finished when the deadline passes is returned; videos still in
+        progress are dropped.
+
         Args:
             movie_name (str): Name of the movie
+            max_results (int): Videos to analyse, defaults to self.max_results
+            deadline (float): Seconds to wait for the videos, defaults to
+                self.deadline
 
         Returns:
-            list: Processed review data
+            list: Processed review data, in search result order
         """
+        max_results = max_results or self.max_results
+        deadline = self.deadline if deadline is None else deadline
+
         logger.info(f"Processing YouTube reviews for: {movie_name}")
         start_time = time.time()
 
         # Get YouTube videos
-        videos = self.search_youtube_reviews(movie_name)
+        videos = self.search_youtube_reviews(movie_name, max_results=max_results)
         logger.info(f"Found {len(videos)} videos for '{movie_name}'")
 
-        results = []
-
         # If no videos found, use sample data
         if not videos:
             logger.warning(
@@ -385,31 +453,27 @@ class YouTubeSentiment:
             )
             return self.generate_sample_reviews(movie_name)
 
-        for i, video in enumerate(videos):
-            try:
-                logger.info(f"Processing video {i + 1}/{len(videos)}: {video['title']}")
-
-                # Get transcript
-                transcript = self.get_video_transcript(video["video_id"])
-
-                if transcript:
-                    logger.info(
-                        f"Got transcript for video: {video['video_id']} (length: {len(transcript)} chars)"
-                    )
-
-                    # Analyze sentiment
-                    analysis = self.analyze_with_openai(transcript, movie_name)
-                    logger.info(
-                        f"Sentiment analysis complete: {analysis['sentiment']} (score: {analysis['score']})"
-                    )
+        futures = [
+            self.video_executor.submit(self.process_video, video, movie_name)
+            for video in videos
+        ]
+        remaining = max(0, deadline - (time.time() - start_time))
+        _, not_done = wait(futures, timeout=remaining)
+        if not_done:
+            logger.warning(
+                f"{len(not_done)}/{len(videos)} videos for '{movie_name}' missed the {deadline}s deadline"
+            )
 
-                    # Combine video info with analysis
-                    review_data = {**video, **analysis}
+        results = []
+        for video, future in zip(videos, futures):
+            if future in not_done:
+                # drop it if it has not started yet, otherwise let it finish unused
+                future.cancel()
+                continue
+            try:
+                review_data = future.result()
+                if review_data:
                     results.append(review_data)
-                else:
-                    logger.warning(
-                        f"No transcript available for video: {video['video_id']}"
-                    )
             except Exception as e:
                 logger.error(f"Error processing video {video['video_id']}: {str(e)}")
 
@@ -428,7 +492,24 @@ class YouTubeSentiment:
         return results
 
     def get_youtube_sentiment(self, movie_title):
-        """Get YouTube sentiment for a movie"""
+        """
+        Get YouTube sentiment for a movie.
+
+        Results are cached by normalised title, and concurrent requests for
+        the same movie share a single run of the search, transcript and
+        OpenAI pipeline. Results made of sample reviews, or with a failed
+        analysis, are only cached for fallback_ttl seconds.
+        """
+        return self.results_cache.get_or_compute(
+            normalize_title(movie_title),
+            lambda: self.compute_youtube_sentiment(movie_title),
+            ttl=lambda results: (
+                self.fallback_ttl if results["youtube"].get("sample") else None
+            ),
+        )
+
+    def compute_youtube_sentiment(self, movie_title):
+        """Run the full YouTube pipeline for a movie, bypassing the cache"""
         youtube_results = self.process_youtube_reviews(movie_title)
 
         # Calculate overall sentiment stats
@@ -471,6 +552,11 @@ class YouTubeSentiment:
             return {
                 "youtube": {
                     "reviews": youtube_results,
+                    # sample reviews or an analysis that failed
+                    "sample": any(
+                        review.get("sample") or review.get("failed")
+                        for review in youtube_results
+                    ),
                     "sentiment_score": sentiment_score,
                     "positive": positive_count,
                     "neutral": neutral_count,
@@ -495,6 +581,7 @@ class YouTubeSentiment:
                     "neutral_examples": [],
                     "negative_examples": [],
                     "source": "YouTube",
+                    "sample": True,
                     "error": "No YouTube data available",
                 }
             }